@@ -1,10 +1,212 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import (Flask, Response, g, render_template, request, send_file, send_from_directory, jsonify, redirect,
+                   stream_with_context, url_for)
 from parser import JazzShopParser
+from http_policy import CircuitOpenError
+from exporters import ExportError, available_formats, get_exporter
+from export_store import ExportStore
+from jobs import JobManager, JobStore, product_stats
+from metrics import HTTP_REQUEST_SECONDS, HTTP_RESPONSES, REGISTRY, RequestProfiler
+from product_index import ProductIndex
+from search_index import SearchIndex
+import atexit
+import json
 import os
-from datetime import datetime
+import queue
+import threading
+import time
 
 app = Flask(__name__)
 
+# Адрес сайта (для нагрузочных тестов - локальный сервер-заглушка)
+app.config['BASE_URL'] = os.environ.get('JAZZ_SHOP_BASE_URL', 'https://jazz-shop.ru')
+# Параллельная загрузка детальной информации о товарах
+app.config['DETAIL_WORKERS'] = int(os.environ.get('JAZZ_SHOP_DETAIL_WORKERS', 8))
+app.config['REQUESTS_PER_SECOND'] = float(os.environ.get('JAZZ_SHOP_REQUESTS_PER_SECOND', 10))
+app.config['HTTP_POOL_SIZE'] = int(os.environ.get('JAZZ_SHOP_HTTP_POOL_SIZE', 32))
+# Таймауты соединения и чтения ответа сайта (с) и число повторов при 429/5xx
+app.config['CONNECT_TIMEOUT'] = float(os.environ.get('JAZZ_SHOP_CONNECT_TIMEOUT', 5))
+app.config['READ_TIMEOUT'] = float(os.environ.get('JAZZ_SHOP_READ_TIMEOUT', 15))
+app.config['MAX_RETRIES'] = int(os.environ.get('JAZZ_SHOP_MAX_RETRIES', 3))
+# Набор правил извлечения: имя из реестра rules.RULE_SETS или путь к JSON-файлу
+app.config['EXTRACTOR_RULES'] = os.environ.get('JAZZ_SHOP_RULES')
+# Фоновые задания поиска и выгрузки
+app.config['JOB_WORKERS'] = int(os.environ.get('JAZZ_SHOP_JOB_WORKERS', 2))
+app.config['JOBS_DIR'] = os.environ.get('JAZZ_SHOP_JOBS_DIR', 'jobs')
+# Время хранения завершенных заданий и их выгрузок (с) и период очистки (с)
+app.config['JOBS_MAX_AGE'] = float(os.environ.get('JAZZ_SHOP_JOBS_MAX_AGE', 24 * 60 * 60))
+app.config['JOBS_EVICT_INTERVAL'] = float(os.environ.get('JAZZ_SHOP_JOBS_EVICT_INTERVAL', 5 * 60))
+# Каталог выгрузок: размер (МБ) и возраст (с) файлов, время хранения результатов для повторной выгрузки (с)
+app.config['EXPORTS_DIR'] = os.environ.get('JAZZ_SHOP_EXPORTS_DIR', 'exports')
+app.config['EXPORTS_MAX_MB'] = float(os.environ.get('JAZZ_SHOP_EXPORTS_MAX_MB', 200))
+app.config['EXPORTS_MAX_AGE'] = float(os.environ.get('JAZZ_SHOP_EXPORTS_MAX_AGE', 60 * 60))
+app.config['EXPORTS_RESULTS_MAX_AGE'] = float(os.environ.get('JAZZ_SHOP_EXPORTS_RESULTS_MAX_AGE', 24 * 60 * 60))
+app.config['EXPORTS_EVICT_INTERVAL'] = float(os.environ.get('JAZZ_SHOP_EXPORTS_EVICT_INTERVAL', 5 * 60))
+# Локальный индекс товаров с историей цен
+app.config['PRODUCT_INDEX_PATH'] = os.environ.get('JAZZ_SHOP_PRODUCT_INDEX', 'jazz_shop_products.sqlite')
+# Профилирование отдельных запросов параметром ?profile=1 (в режиме отладки включено всегда)
+app.config['PROFILE_REQUESTS'] = os.environ.get('JAZZ_SHOP_PROFILE_REQUESTS') == '1'
+
+_parser = None
+_parser_lock = threading.Lock()
+_job_manager = None
+_product_index = None
+_search_index = None
+# Наибольшая версия строк ProductIndex, уже загруженных в полнотекстовый индекс (None - ни одной)
+_search_index_version = None
+_search_index_lock = threading.Lock()
+_export_store = None
+
+
+def get_parser():
+    """Общий для всех запросов экземпляр парсера с пулом соединений"""
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            _parser = JazzShopParser(base_url=app.config['BASE_URL'],
+                                     max_workers=app.config['DETAIL_WORKERS'],
+                                     requests_per_second=app.config['REQUESTS_PER_SECOND'],
+                                     pool_size=app.config['HTTP_POOL_SIZE'],
+                                     rules=app.config['EXTRACTOR_RULES'],
+                                     timeout=app.config['READ_TIMEOUT'],
+                                     connect_timeout=app.config['CONNECT_TIMEOUT'],
+                                     max_retries=app.config['MAX_RETRIES'])
+        return _parser
+
+
+def get_product_index():
+    """Общий локальный индекс товаров"""
+    global _product_index
+    with _parser_lock:
+        if _product_index is None:
+            _product_index = ProductIndex(app.config['PRODUCT_INDEX_PATH'])
+        return _product_index
+
+
+def get_search_index():
+    """Полнотекстовый индекс товаров, обновляемый по мере сохранения результатов
+
+    Товары, сохраненные этим процессом, попадают в индекс сразу (подписка на
+    ProductIndex). Товары, собранные другими процессами (воркерами gunicorn),
+    подгружаются из общей базы SQLite при обращении к индексу: читаются только
+    строки с версией больше уже загруженной. Подгрузка идет под собственной
+    блокировкой; пока ее выполняет один запрос, остальные ищут по текущему индексу.
+    """
+    global _search_index, _search_index_version
+    product_index = get_product_index()
+    current = _search_index
+    if current is None:
+        _search_index_lock.acquire()
+    elif not _search_index_lock.acquire(blocking=False):
+        return current
+    try:
+        initial = _search_index is None
+        if initial:
+            _search_index = SearchIndex()
+            product_index.add_listener(_search_index.add)
+        _search_index_version, changed = product_index.changes(_search_index_version)
+        for key, product in changed:
+            _search_index.add(key, product)
+        if initial:
+            print(f"Полнотекстовый индекс: товаров {len(_search_index)}")
+        return _search_index
+    finally:
+        _search_index_lock.release()
+
+
+def get_export_store():
+    """Общий каталог выгрузок с фоновым вытеснением"""
+    global _export_store
+    with _parser_lock:
+        if _export_store is None:
+            _export_store = ExportStore(app.config['EXPORTS_DIR'],
+                                        max_bytes=int(app.config['EXPORTS_MAX_MB'] * 1024 * 1024),
+                                        max_age=app.config['EXPORTS_MAX_AGE'],
+                                        results_max_age=app.config['EXPORTS_RESULTS_MAX_AGE'],
+                                        interval=app.config['EXPORTS_EVICT_INTERVAL']).start()
+        return _export_store
+
+
+def get_job_manager():
+    """Общий менеджер фоновых заданий"""
+    global _job_manager
+    parser = get_parser()
+    index = get_product_index()
+    exports = get_export_store()
+    with _parser_lock:
+        if _job_manager is None:
+            store = JobStore(app.config['JOBS_DIR'], max_age=app.config['JOBS_MAX_AGE'],
+                             interval=app.config['JOBS_EVICT_INTERVAL']).start()
+            _job_manager = JobManager(parser, store, max_workers=app.config['JOB_WORKERS'],
+                                      index=index, exports=exports)
+        return _job_manager
+
+
+@atexit.register
+def close_parser():
+    """Остановка заданий и закрытие соединений парсера при остановке приложения"""
+    global _parser, _job_manager, _product_index, _export_store
+    with _parser_lock:
+        if _job_manager is not None:
+            # Выполняющиеся задания дорабатывают, пока индекс товаров и сессия парсера еще открыты
+            _job_manager.shutdown(wait=True)
+            _job_manager = None
+        if _export_store is not None:
+            _export_store.close()
+            _export_store = None
+        if _product_index is not None:
+            _product_index.close()
+            _product_index = None
+        if _parser is not None:
+            _parser.close()
+            _parser = None
+
+
+def create_app(config=None):
+    """Приложение для WSGI-сервера (wsgi.py, gunicorn.conf.py)
+
+    Настройки берутся из переменных окружения JAZZ_SHOP_*, config дополняет их.
+    Приложение одно на процесс: парсер, задания, индексы и метрики создаются
+    при первом запросе в каждом процессе, у gunicorn - в каждом воркере
+    после fork, поэтому /metrics показывает данные только своего воркера.
+    Полнотекстовый индекс каждого воркера подгружает товары других воркеров
+    из общей базы SQLite перед поиском.
+    """
+    if config:
+        app.config.update(config)
+    return app
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request.args.get('profile') == '1' and (app.config['PROFILE_REQUESTS'] or app.debug):
+        g.profiler = RequestProfiler()
+        g.profiler.start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Длительность и код ответа каждого запроса; при ?profile=1 вместо ответа - отчет профилировщика"""
+    endpoint = request.endpoint or 'unknown'
+    started = g.get('request_started', time.perf_counter())
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+    HTTP_RESPONSES.inc(endpoint=endpoint, status=str(response.status_code))
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        report = profiler.stop()
+        # Потоковые ответы выполняются после выхода из обработчика, их профиль неполон
+        if not response.is_streamed:
+            return Response(f"Профиль ({profiler.backend}) {request.method} {request.full_path}\n\n{report}",
+                            mimetype='text/plain')
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -16,80 +218,224 @@ def index():
 
         print(f"Поисковый запрос: {query}")
 
-        # Создаем парсер и выполняем поиск
-        parser = JazzShopParser()
+        # Поиск, детальная информация и выгрузка выполняются в фоновом задании
+        job_id = get_job_manager().submit(query)
+        return redirect(url_for('index', job=job_id))
 
-        # Поиск товаров
-        products = parser.search_products(query)
-        print(f"Найдено товаров: {len(products)}")
+    job_id = request.args.get('job')
+    if job_id:
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return render_template('index.html', error="Задание не найдено")
+        if job['status'] == 'failed':
+            return render_template('index.html', query=job['query'],
+                                   error=f"Ошибка выполнения поиска: {job['error']}")
+        if job['status'] != 'done':
+            return render_template('index.html', query=job['query'], job=job)
 
-        # Получаем детальную информацию для товаров (ограничим для скорости)
-        detailed_products = []
-        max_detailed = min(3, len(products))  # Ограничиваем до 3 товаров для детального парсинга
+        stats = dict(job['stats'])
+        success = job['progress']['export_written']
+        stats['download_url'] = url_for('download_job', job_id=job_id) if success else None
+        stats['export_formats'] = [fmt for fmt in available_formats() if fmt != 'xlsx']
+        return render_template('index.html',
+                               products=job['products'],
+                               query=job['query'],
+                               stats=stats,
+                               success=success)
 
-        for i, product in enumerate(products):
-            if i < max_detailed and product.get('Ссылка'):
-                print(f"Получение детальной информации для товара {i + 1}")
-                detailed_info = parser.get_detailed_info(product['Ссылка'])
-                product.update(detailed_info)
-            detailed_products.append(product)
+    return render_template('index.html')
 
-        # Сохраняем в Excel
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_query = "".join(x for x in query if x.isalnum() or x in (' ', '-', '_')).rstrip()
-        filename = f"jazz_shop_{safe_query}_{timestamp}.xlsx"
 
-        success = parser.save_to_excel(detailed_products, filename)
+def sse_event(event, data):
+    """Событие Server-Sent Events с данными в JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        # Статистика
-        stats = {
-            'total_found': len(products),
-            'detailed_processed': max_detailed,
-            'in_stock': len([p for p in products if p.get('Наличие') == 'В наличии']),
-            'filename': filename if success else None
-        }
 
-        return render_template('index.html',
-                               products=detailed_products,
-                               query=query,
-                               stats=stats,
-                               success=success)
+@app.route('/stream')
+def stream():
+    """Поиск с потоковой выдачей результатов (Server-Sent Events)
 
-    return render_template('index.html')
+    Товары отправляются событиями product сразу после разбора страницы поиска,
+    детальная информация - событиями detail по мере загрузки страниц товаров,
+    в конце - событие done со статистикой и ссылкой на файл Excel.
+    """
+    query = request.args.get('query', '').strip()
+    if not query:
+        return jsonify({'error': 'Введите поисковый запрос'}), 400
+
+    parser = get_parser()
+    index = get_product_index()
+    exports = get_export_store()
+    print(f"Потоковый поиск: {query}")
+
+    def generate():
+        yield sse_event('start', {'query': query})
+        try:
+            products = parser.search_products(query)
+        except CircuitOpenError as e:
+            yield sse_event('error', {'error': str(e)})
+            return
+
+        stale = index.merge_listing(products)
+        positions = {id(product): position for position, product in enumerate(products)}
+        for position, product in enumerate(products):
+            yield sse_event('product', {'id': position, 'product': product.to_dict()})
+
+        # Страницы товаров загружаются в отдельном потоке, результаты приходят через очередь;
+        # если клиент отключится, загрузка и сохранение в индекс все равно завершатся
+        details = queue.Queue()
+
+        def enrich():
+            try:
+                parser.enrich_products(stale, on_result=details.put)
+                index.save_details(stale)
+            finally:
+                details.put(None)
+
+        threading.Thread(target=enrich, daemon=True).start()
+        while (product := details.get()) is not None:
+            yield sse_event('detail', {
+                'id': positions[id(product)],
+                'Описание': product.get('Описание'),
+                'Характеристики': product.get('Характеристики'),
+            })
+
+        # Файл Excel создается при первом скачивании; одинаковые результаты используют один файл
+        stats = product_stats(products)
+        stats['download_url'] = None
+        if products:
+            key = exports.put(products, query[:50])
+            stats['download_url'] = url_for('download_file', filename=exports.filename(key))
+        yield sse_event('done', stats)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Постановка задания поиска; возвращает идентификатор задания"""
+    data = request.get_json(silent=True) or request.form
+    query = (data.get('query') or '').strip()
+    if not query:
+        return jsonify({'error': 'Введите поисковый запрос'}), 400
+
+    job_id = get_job_manager().submit(query)
+    return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Пакетный поиск по списку запросов в фоновом задании"""
+    data = request.get_json(silent=True) or {}
+    queries = [str(q).strip() for q in data.get('queries') or [] if str(q).strip()]
+    if not queries:
+        return jsonify({'error': 'Передайте непустой список queries'}), 400
+
+    job_id = get_job_manager().submit_batch(queries)
+    return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Прогресс задания"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задание не найдено'}), 404
+
+    job = {key: value for key, value in job.items() if key != 'products'}
+    if job['status'] == 'done' and job['progress']['export_written']:
+        job['download_url'] = url_for('download_job', job_id=job_id)
+        job['export_formats'] = available_formats()
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    """Скачивание выгрузки готового задания"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задание не найдено'}), 404
+    if job['status'] != 'done' or not job['progress']['export_written']:
+        return jsonify({'error': 'Выгрузка еще не готова', 'status': job['status']}), 409
+
+    fmt = request.args.get('format', 'xlsx')
+    try:
+        exporter = get_exporter(fmt)
+        path = manager.export(job, fmt)
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+
+    download_name = os.path.splitext(job['download_name'])[0] + '.' + exporter.extension
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=download_name,
+                     mimetype=exporter.mimetype)
 
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    """Скачивание файла Excel"""
+    """Скачивание выгрузки из каталога выгрузок
+
+    filename - ключ результатов с расширением (<ключ>.xlsx); ?format=csv|jsonl|parquet
+    выбирает другой формат. Вытесненный файл создается заново из сохраненных результатов.
+    """
+    exports = get_export_store()
+    key = os.path.splitext(filename)[0]
     try:
-        return send_file(filename, as_attachment=True)
-    except Exception as e:
-        return f"Ошибка загрузки файла: {e}"
+        exporter = get_exporter(request.args.get('format', 'xlsx'))
+        path = exports.path(key, exporter.name)
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, FileNotFoundError):
+        return jsonify({'error': 'Выгрузка не найдена или устарела, повторите поиск'}), 404
+
+    return send_from_directory(exports.directory, os.path.basename(path), as_attachment=True,
+                               download_name=exports.download_name(key, exporter.name), mimetype=exporter.mimetype)
 
 
 @app.route('/api/search/<query>')
 def api_search(query):
-    """API endpoint для поиска"""
-    parser = JazzShopParser()
-    products = parser.search_products(query)
-    return jsonify(products)
+    """API endpoint для поиска
+
+    ?source=local отвечает из локального полнотекстового индекса уже
+    собранных товаров без обращения к сайту (?limit= - число результатов).
+    """
+    if request.args.get('source') in ('local', 'index'):
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify(get_search_index().search(query, limit=limit))
+
+    try:
+        products = get_parser().search_products(query)
+    except CircuitOpenError as e:
+        return jsonify({'error': str(e)}), 503
+    get_product_index().merge_listing(products)
+    return jsonify([product.to_dict() for product in products])
+
+
+@app.route('/api/products/history')
+def api_product_history():
+    """История цены и наличия товара по ключу из индекса (?key=article:XXX или link:URL)"""
+    key = request.args.get('key', '')
+    product = get_product_index().get(key)
+    if product is None:
+        return jsonify({'error': 'Товар не найден'}), 404
+    return jsonify({'product': product, 'history': get_product_index().history(key)})
 
 
 @app.route('/cleanup')
 def cleanup():
-    """Очистка временных файлов (опционально)"""
+    """Внеочередное вытеснение устаревших выгрузок (обычно выполняется в фоне)"""
     try:
-        for file in os.listdir('.'):
-            if file.startswith('jazz_shop_') and file.endswith('.xlsx'):
-                os.remove(file)
-        return "Файлы очищены"
-    except Exception as e:
+        removed = get_export_store().evict()
+        return f"Удалено файлов: {removed}"
+    except OSError as e:
         return f"Ошибка очистки: {e}"
 
 
 if __name__ == '__main__': #Запуск
+    # Сервер разработки с отладчиком; для работы под нагрузкой: gunicorn -c gunicorn.conf.py wsgi:app
     # Создаем папку для шаблонов если её нет
     if not os.path.exists('templates'):
         os.makedirs('templates')
 
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Пакетный поиск по списку запросов
+
+Запуск: python batch.py queries.txt -o prices.xlsx [--workers 4] [--detail-workers 8]
+Файл запросов: один запрос на строку, строки с # пропускаются.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from parser import JazzShopParser
+from product import DETAIL_KEYS, product_key
+
+
+def read_queries(path):
+    """Чтение запросов из текстового файла"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def run_batch(parser, queries, max_workers=4, on_search=None, on_details=None, on_result=None, index=None):
+    """Поиск по всем запросам и однократная загрузка страницы каждого товара
+
+    Если передан индекс товаров, загружаются только страницы товаров,
+    карточки которых изменились. Возвращает словарь {запрос: товары}
+    в порядке запросов и число загруженных страниц товаров. on_details
+    вызывается с числом страниц товаров перед их загрузкой.
+    """
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return {}, 0
+
+    def search(query):
+        products = parser.search_products(query)
+        if on_search:
+            on_search(query, products)
+        return products
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as executor:
+        results = dict(zip(queries, executor.map(search, queries)))
+
+    # Один представитель на товар, встречающийся в нескольких запросах
+    groups = {}
+    for products in results.values():
+        for product in products:
+            key = product_key(product)
+            if key is not None:
+                groups.setdefault(key, []).append(product)
+
+    representatives = [group[0] for group in groups.values()]
+    print(f"Уникальных товаров: {len(representatives)} из {sum(len(p) for p in results.values())}")
+    if index is not None:
+        representatives = index.merge_listing(representatives)
+    if on_details:
+        on_details(len([p for p in representatives if p.get('Ссылка')]))
+    detailed_count = parser.enrich_products(representatives, on_result=on_result)
+    if index is not None:
+        index.save_details(representatives)
+
+    for group in groups.values():
+        details = {field: group[0][field] for field in DETAIL_KEYS if field in group[0]}
+        for product in group[1:]:
+            product.update(details)
+
+    return results, detailed_count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Пакетный поиск товаров Jazz Shop")
+    arg_parser.add_argument('queries_file', help="Файл с запросами, по одному на строку")
+    arg_parser.add_argument('-o', '--output', default='jazz_shop_batch.xlsx', help="Файл Excel для результатов")
+    arg_parser.add_argument('--workers', type=int, default=4, help="Число одновременных поисковых запросов")
+    arg_parser.add_argument('--detail-workers', type=int, default=8, help="Потоки загрузки страниц товаров")
+    arg_parser.add_argument('--rps', type=float, default=10, help="Ограничение запросов в секунду к сайту")
+    args = arg_parser.parse_args()
+
+    queries = read_queries(args.queries_file)
+    print(f"Запросов: {len(queries)}")
+
+    started = time.perf_counter()
+    with JazzShopParser(max_workers=args.detail_workers, requests_per_second=args.rps) as parser:
+        results, detailed_count = run_batch(parser, queries, max_workers=args.workers)
+        parser.save_batch_to_excel(results, args.output)
+
+    print(f"Готово за {time.perf_counter() - started:.1f} с, детально обработано товаров: {detailed_count}")
+
+
+if __name__ == '__main__':
+    main()
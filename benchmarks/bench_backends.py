@@ -0,0 +1,45 @@
+"""Время и память разбора страницы для каждого парсера HTML
+
+Запуск: python -m benchmarks.bench_backends [--repeat 5] [--scale 1 4 16]
+"""
+import argparse
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from benchmarks.bench_find_products import FIXTURES, best_time, read_fixture, temp_state
+from parser import PARSER_BACKENDS, JazzShopParser
+
+
+def measure_memory(html, backend):
+    """Пиковая память при построении дерева, КБ"""
+    tracemalloc.start()
+    soup = BeautifulSoup(html, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del soup
+    return peak / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--scale', type=int, nargs='+', default=[1, 4, 16])
+    args = arg_parser.parse_args()
+
+    print(f"{'фикстура':<24}{'x':>4}{'парсер':>13}{'разбор, мс':>12}{'поиск, мс':>11}"
+          f"{'память, КБ':>12}{'товаров':>9}")
+    for name in FIXTURES:
+        for scale in args.scale:
+            html = read_fixture(name, scale)
+            for backend in PARSER_BACKENDS:
+                parser = JazzShopParser(cache=False, state=temp_state(), backend=backend)
+                parse_time, soup = best_time(lambda: BeautifulSoup(html, backend), args.repeat)
+                find_time, products = best_time(lambda: parser._find_products(soup), args.repeat)
+                memory = measure_memory(html, backend)
+                print(f"{name:<24}{scale:>4}{backend:>13}{parse_time * 1000:>12.1f}{find_time * 1000:>11.1f}"
+                      f"{memory:>12.0f}{len(products):>9}")
+
+
+if __name__ == '__main__':
+    main()
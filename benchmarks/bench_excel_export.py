@@ -0,0 +1,78 @@
+"""Время и пиковая память экспорта в Excel: прежняя книга в памяти и потоковая запись
+
+Запуск: python -m benchmarks.bench_excel_export [--rows 1000 10000 30000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill
+
+from benchmarks.bench_find_products import temp_state
+from exporters import EXCEL_HEADERS
+from parser import JazzShopParser
+
+
+def generate_products(count):
+    """Генератор синтетических товаров"""
+    for i in range(count):
+        yield {
+            'Название': f"Акустическая гитара Yamaha F{i}",
+            'Бренд': 'Yamaha',
+            'Цена': f"{10000 + i:.2f}",
+            'Наличие': 'В наличии',
+            'Артикул': f"YF-{i}",
+            'Ссылка': f"https://jazz-shop.ru/catalog/gitary/yf-{i}/",
+            'Описание': 'Акустическая гитара с ельной верхней декой и корпусом дредноут.',
+            'Характеристики': '{"Корпус": "Дредноут", "Струны": "Металл"}',
+        }
+
+
+def legacy_save_to_excel(products, filename):
+    """Прежний экспорт: вся книга в памяти и второй проход для ширины колонок"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Товары"
+    for col, header in enumerate(EXCEL_HEADERS, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+    for row, product in enumerate(products, 2):
+        for col, header in enumerate(EXCEL_HEADERS, 1):
+            ws.cell(row=row, column=col, value=product.get(header, ''))
+    for column in ws.columns:
+        max_length = max(len(str(cell.value)) for cell in column)
+        ws.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+    wb.save(filename)
+
+
+def measure(func, rows, filename):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(generate_products(rows), filename)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 30000])
+    args = arg_parser.parse_args()
+
+    parser = JazzShopParser(cache=False, state=temp_state())
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'export.xlsx')
+        print(f"{'строк':>8}{'прежний, с':>12}{'МБ':>8}{'потоковый, с':>14}{'МБ':>8}")
+        for rows in args.rows:
+            legacy_time, legacy_peak = measure(legacy_save_to_excel, rows, filename)
+            stream_time, stream_peak = measure(parser.save_to_excel, rows, filename)
+            print(f"{rows:>8}{legacy_time:>12.2f}{legacy_peak:>8.1f}{stream_time:>14.2f}{stream_peak:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Время записи и размер файла для каждого формата выгрузки
+
+Запуск: python -m benchmarks.bench_exporters [--rows 1000 10000 30000]
+Форматы, для которых не установлены нужные пакеты (pyarrow для Parquet), пропускаются.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_excel_export import generate_products
+from exporters import EXPORTERS, export_products
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 30000])
+    args = arg_parser.parse_args()
+
+    skipped = [name for name, exporter in EXPORTERS.items() if not exporter.available]
+    if skipped:
+        print(f"Пропущены форматы без нужных пакетов: {', '.join(skipped)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'строк':>8}{'формат':>10}{'время, с':>12}{'размер, КБ':>14}{'строк/с':>12}")
+        for rows in args.rows:
+            for name, exporter in EXPORTERS.items():
+                if not exporter.available:
+                    continue
+                filename = os.path.join(tmp, f"export.{exporter.extension}")
+                started = time.perf_counter()
+                export_products(generate_products(rows), filename, name)
+                elapsed = time.perf_counter() - started
+                size = os.path.getsize(filename) / 1024
+                print(f"{rows:>8}{name:>10}{elapsed:>12.3f}{size:>14.0f}{rows / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
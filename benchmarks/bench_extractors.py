@@ -0,0 +1,113 @@
+"""Стоимость извлечения полей одной карточки: прежние извлекатели и реестр правил
+
+Прежние извлекатели собирали списки селекторов и шаблонов при каждом вызове
+и передавали строки шаблонов в re. Запуск: python -m benchmarks.bench_extractors
+"""
+import argparse
+import re
+import timeit
+
+from benchmarks.bench_find_products import load_fixture, temp_state
+from parser import JazzShopParser
+from product import FIELDS, Product
+
+
+def legacy_extract_name(element):
+    name_selectors = [
+        '.name', '.title', '.product-name', '.item-name',
+        'h1', 'h2', 'h3', 'h4', 'a[class*="name"]', 'a[class*="title"]'
+    ]
+    for selector in name_selectors:
+        name_elem = element.select_one(selector)
+        if name_elem:
+            text = name_elem.get_text(strip=True)
+            if text and len(text) > 3:
+                return text
+    for link in element.find_all('a', href=True):
+        text = link.get_text(strip=True)
+        if text and len(text) > 3 and not re.match(r'^(купить|в корзину|подробнее)$', text, re.IGNORECASE):
+            return text
+    return None
+
+
+def legacy_extract_price(element):
+    text = element.get_text()
+    price_patterns = [
+        r'(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)\s*руб',
+        r'(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)\s*р\.',
+        r'цена[:\s]*(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)',
+        r'₽\s*(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)'
+    ]
+    for pattern in price_patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            try:
+                return f"{float(matches[0].replace(' ', '').replace(',', '.')):.2f}"
+            except ValueError:
+                continue
+    return None
+
+
+def legacy_extract_brand(element):
+    for selector in ['.brand', '.vendor', '.producer', '.manufacturer']:
+        brand_elem = element.select_one(selector)
+        if brand_elem:
+            return brand_elem.get_text(strip=True)
+    return None
+
+
+def legacy_extract_availability(element):
+    text = element.get_text().lower()
+    if any(word in text for word in ['в наличии', 'есть', 'доступен', 'available', 'купить']):
+        return "В наличии"
+    elif any(word in text for word in ['нет в наличии', 'распродан', 'ожидается', 'под заказ']):
+        return "Нет в наличии"
+    return "Неизвестно"
+
+
+def legacy_extract_article(element):
+    text = element.get_text()
+    patterns = [
+        r'арт[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
+        r'art[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
+        r'код[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
+        r'code[.\s]*[:#]?\s*([a-zA-Z0-9-]+)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return match.group(1)
+    return "Артикул не найден"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--number', type=int, default=20)
+    args = arg_parser.parse_args()
+
+    parser = JazzShopParser(cache=False, state=temp_state())
+    soup = load_fixture('search_catalog.html', 1)
+    elements = soup.select('.catalog-item')
+
+    fields = [
+        ('Название', legacy_extract_name, parser._extract_name),
+        ('Цена', legacy_extract_price, parser._extract_price_from_element),
+        ('Бренд', legacy_extract_brand, parser._extract_brand),
+        ('Наличие', legacy_extract_availability, parser._extract_availability),
+        ('Артикул', legacy_extract_article, parser._extract_article),
+    ]
+
+    calls = args.number * len(elements)
+    print(f"{'поле':<12}{'прежний, мкс':>14}{'реестр, мкс':>13}")
+    for field, legacy, current in fields:
+        for element in elements:
+            # Прежние извлекатели возвращали строки-заглушки, новые - None и числовую цену
+            expected = getattr(Product.from_dict({field: legacy(element)}), FIELDS[field][0])
+            assert expected == current(element), f"Результаты различаются для поля {field}"
+        legacy_time = timeit.timeit(lambda: [legacy(e) for e in elements], number=args.number)
+        current_time = timeit.timeit(lambda: [current(e) for e in elements], number=args.number)
+        print(f"{field:<12}{legacy_time / calls * 1e6:>14.1f}{current_time / calls * 1e6:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
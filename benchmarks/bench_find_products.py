@@ -0,0 +1,148 @@
+"""Сравнение _find_products с прежним многопроходным поиском
+
+Замеряются прежний алгоритм, однопроходный поиск всеми методами и быстрый
+путь по выученной разметке карточек.
+
+Запуск: python -m benchmarks.bench_find_products [--repeat 5] [--scale 1 4 16]
+"""
+import argparse
+import atexit
+import contextlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.standin_server import CARD_LINK_RE
+from parser import JazzShopParser, unique_by_link
+from product import Product
+from site_state import SiteState
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+FIXTURES = ['search_catalog.html', 'search_fallback.html']
+
+LEGACY_CLASS_SELECTORS = [
+    '.product', '.item', '.goods', '.catalog-item', '.product-item',
+    '.item-product', '.card', '.product-card', '.shop-item'
+]
+
+
+def legacy_find_products(parser, soup, limit=20):
+    """Прежний алгоритм: отдельный проход по дереву для каждого селектора и метода"""
+    products = []
+
+    for selector in LEGACY_CLASS_SELECTORS:
+        elements = soup.select(selector)
+        if elements:
+            for element in elements:
+                product = legacy_parse_product_element(parser, element)
+                if product and product['Название'] != "Название не найдено":
+                    products.append(product)
+            if products:
+                return products
+
+    price_elements = soup.find_all(string=re.compile(r'руб|р\.|₽|цена', re.IGNORECASE))
+    for price_element in price_elements:
+        product = legacy_parse_product_element(parser, price_element.parent)
+        if product and product['Название'] != "Название не найдено":
+            products.append(product)
+
+    cards = soup.find_all(['div', 'article', 'li'], class_=True)
+    for card in cards:
+        card_classes = card.get('class', [])
+        if any(cls for cls in card_classes if
+               any(word in cls.lower() for word in ['product', 'item', 'card', 'goods', 'shop'])):
+            product = legacy_parse_product_element(parser, card)
+            if product and product['Название'] != "Название не найдено":
+                products.append(product)
+
+    return products[:limit]
+
+
+def legacy_parse_product_element(parser, element):
+    """Разбор карточки, где каждый извлекатель заново вычисляет текст элемента"""
+    return Product(
+        name=parser._extract_name(element),
+        price=parser._extract_price_from_element(element),
+        url=parser._extract_link(element),
+        brand=parser._extract_brand(element),
+        availability=parser._extract_availability(element),
+        article=parser._extract_article(element),
+    )
+
+
+def temp_state():
+    """Состояние парсера во временном каталоге: бенчмарки не меняют jazz_shop_state.json"""
+    directory = tempfile.mkdtemp(prefix='jazz_shop_bench_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return SiteState(os.path.join(directory, 'state.json'))
+
+
+def read_fixture(name, scale=1):
+    """Чтение фикстуры с умножением списка товаров в scale раз
+
+    Ссылки товаров в каждой копии получают номер копии, чтобы копии не
+    считались дублями.
+    """
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        html = f.read()
+    if scale > 1:
+        body_start = html.index('<main')
+        body_end = html.index('</main>')
+        body = html[body_start:body_end]
+        copies = [body] + [CARD_LINK_RE.sub(lambda m, n=n: f'href="{m.group(1)}-{n}/"', body)
+                           for n in range(1, scale)]
+        html = html[:body_start] + ''.join(copies) + html[body_end:]
+    return html
+
+
+def load_fixture(name, scale, backend='html.parser'):
+    """Загрузка фикстуры в дерево BeautifulSoup"""
+    return BeautifulSoup(read_fixture(name, scale), backend)
+
+
+def best_time(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--scale', type=int, nargs='+', default=[1, 4, 16])
+    args = arg_parser.parse_args()
+
+    parser = JazzShopParser(cache=False, state=temp_state())
+    print(f"{'фикстура':<24}{'x':>4}{'прежний, мс':>14}{'все методы, мс':>16}{'разметка, мс':>14}{'ускорение':>11}")
+    for name in FIXTURES:
+        for scale in args.scale:
+            soup = load_fixture(name, scale)
+            legacy_time, _ = best_time(lambda: legacy_find_products(parser, soup), args.repeat)
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser.layout = None
+                discovery_time, discovery_result = best_time(lambda: parser._discover_products(soup, 20),
+                                                             args.repeat)
+                # Разметка выучена на предыдущем шаге (для страниц без классов карточек - не выучивается)
+                fast_time, fast_result = best_time(lambda: parser._find_products(soup), args.repeat)
+
+            # Новый поиск отличается от прежнего только отброшенными дублями по ссылке;
+            # ограничение в 20 товаров действует только для резервных методов
+            expected = unique_by_link(legacy_find_products(parser, soup, limit=None))
+            assert discovery_result == expected[:max(20, len(discovery_result))], \
+                f"Результаты различаются для {name} x{scale}"
+            assert fast_result == discovery_result, f"Быстрый путь отличается для {name} x{scale}"
+            print(f"{name:<24}{scale:>4}{legacy_time * 1000:>14.1f}{discovery_time * 1000:>16.1f}"
+                  f"{fast_time * 1000:>14.1f}{legacy_time / fast_time:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
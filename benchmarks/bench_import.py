@@ -0,0 +1,62 @@
+"""Время импорта и память модулей приложения
+
+Каждый импорт выполняется в отдельном процессе, чтобы модули не кэшировались.
+Для сравнения измеряются библиотеки, которые раньше импортировались при
+загрузке модулей выгрузки: pandas (excel_handler) и openpyxl (parser).
+
+Запуск: python -m benchmarks.bench_import [--repeat 5] [модуль ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ['exporters', 'excel_handler', 'parser', 'app']
+# Прежние зависимости модулей выгрузки; отсутствующие пропускаются
+LEGACY_IMPORTS = ['openpyxl', 'pandas']
+
+PROBE = """
+import resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+loaded = [name for name in ('openpyxl', 'pandas', 'pyarrow') if name in sys.modules]
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ','.join(loaded) or '-')
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module, repeat):
+    """Медиана времени импорта (мс), пиковый RSS процесса (МБ) и загруженные тяжелые библиотеки"""
+    times, peaks, loaded = [], [], '-'
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', PROBE.format(module=module)], cwd=ROOT,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        elapsed, peak, loaded = result.stdout.split()
+        times.append(float(elapsed) * 1000)
+        peaks.append(int(peak) / 1024)
+    return statistics.median(times), max(peaks), loaded
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('modules', nargs='*', default=MODULES + LEGACY_IMPORTS)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"{'модуль':>16}{'импорт, мс':>12}{'RSS, МБ':>10}  загружены")
+    for module in args.modules:
+        result = measure(module, args.repeat)
+        if result is None:
+            print(f"{module:>16}{'не установлен':>22}")
+            continue
+        elapsed, peak, loaded = result
+        print(f"{module:>16}{elapsed:>12.0f}{peak:>10.1f}  {loaded}")
+
+
+if __name__ == '__main__':
+    main()
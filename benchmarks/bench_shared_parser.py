@@ -0,0 +1,83 @@
+"""Сравнение нового парсера на каждый запрос и общего пула соединений
+
+Запуск: python -m benchmarks.bench_shared_parser [--clients 8] [--requests 10]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.standin_server import StandInServer
+from parser import JazzShopParser
+from site_state import SiteState
+
+
+def make_parser(base_url, state_path):
+    return JazzShopParser(base_url=base_url, cache=False, requests_per_second=0,
+                          state=SiteState(state_path), pool_size=32)
+
+
+def simulate_request(parser, products_per_request):
+    """Аналог обработки POST-запроса: поиск и детальная информация"""
+    started = time.perf_counter()
+    products = parser.search_products('гитара')
+    parser.enrich_products(products[:products_per_request])
+    return time.perf_counter() - started
+
+
+def run(mode, server, clients, requests_per_client, products_per_request, state_path):
+    server.reset_stats()
+    shared = make_parser(server.base_url, state_path) if mode == 'shared' else None
+
+    def client():
+        timings = []
+        for _ in range(requests_per_client):
+            if shared is not None:
+                timings.append(simulate_request(shared, products_per_request))
+            else:
+                with make_parser(server.base_url, state_path) as parser:
+                    timings.append(simulate_request(parser, products_per_request))
+        return timings
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        timings = [t for result in executor.map(lambda _: client(), range(clients)) for t in result]
+    elapsed = time.perf_counter() - started
+
+    if shared is not None:
+        shared.close()
+
+    timings.sort()
+    return {
+        'mode': mode,
+        'mean_ms': statistics.mean(timings) * 1000,
+        'p95_ms': timings[int(len(timings) * 0.95) - 1] * 1000,
+        'throughput': len(timings) / elapsed,
+        'connections': server.connections,
+        'http_requests': server.requests,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--clients', type=int, default=8)
+    arg_parser.add_argument('--requests', type=int, default=10)
+    arg_parser.add_argument('--products', type=int, default=5)
+    arg_parser.add_argument('--latency', type=float, default=0.005)
+    args = arg_parser.parse_args()
+
+    server = StandInServer(latency=args.latency).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'state.json')
+        print(f"{'режим':<10}{'среднее, мс':>14}{'p95, мс':>10}{'запр/с':>10}{'TCP':>8}{'HTTP':>8}")
+        for mode in ('per-request', 'shared'):
+            r = run(mode, server, args.clients, args.requests, args.products, state_path)
+            print(f"{r['mode']:<10}{r['mean_ms']:>14.1f}{r['p95_ms']:>10.1f}{r['throughput']:>10.1f}"
+                  f"{r['connections']:>8}{r['http_requests']:>8}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Проверка размыкателя цепи: пробный запрос, завершившийся любым исключением
+
+После серии ошибок цепь размыкается; пробный запрос падает с исключением,
+которое RequestPolicy не повторяет (оборванный ответ, сбой распаковки,
+слишком много перенаправлений). Цепь должна снова разомкнуться на
+reset_timeout и затем пропустить следующий пробный запрос, а не отклонять
+запросы к хосту до перезапуска процесса. При ошибке скрипт завершается с кодом 1.
+
+Запуск: python -m benchmarks.check_circuit_breaker
+"""
+import sys
+import time
+
+import requests
+
+from http_policy import CircuitOpenError, RequestPolicy
+
+URL = 'http://jazz-shop.test/catalog/'
+RESET_TIMEOUT = 0.05
+PROBE_ERRORS = (requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError,
+                requests.TooManyRedirects)
+
+
+class ScriptedSession:
+    """Сессия, которая по очереди выбрасывает заданные исключения, а затем отвечает 200"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+
+    def get(self, url, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)(url)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        return response
+
+
+def check(probe_error):
+    """Описание ошибки или None, если цепь восстановилась"""
+    session = ScriptedSession([requests.ConnectionError, requests.ConnectionError, probe_error])
+    policy = RequestPolicy(session, requests_per_second=0, max_retries=0, failure_threshold=2,
+                           reset_timeout=RESET_TIMEOUT)
+
+    for _ in range(2):
+        try:
+            policy.get(URL)
+        except requests.ConnectionError:
+            pass
+    if policy.breaker('jazz-shop.test').state != 'open':
+        return "цепь не разомкнулась после серии ошибок"
+
+    time.sleep(RESET_TIMEOUT * 2)
+    try:
+        policy.get(URL)
+        return "пробный запрос не выбросил исключение"
+    except probe_error:
+        pass
+
+    time.sleep(RESET_TIMEOUT * 2)
+    try:
+        response = policy.get(URL)
+    except CircuitOpenError as e:
+        return f"цепь не восстановилась: {e}"
+    if response.status_code != 200 or policy.breaker('jazz-shop.test').state != 'closed':
+        return "цепь не замкнулась после успешного пробного запроса"
+    return None
+
+
+def main():
+    failed = False
+    for probe_error in PROBE_ERRORS:
+        error = check(probe_error)
+        print(f"{probe_error.__name__:>24}: {error or 'ok'}")
+        failed = failed or error is not None
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Нагрузочный тест: сервер разработки Flask против gunicorn
+
+Приложение запускается отдельным процессом в каждом режиме и ищет товары
+на локальном сервере-заглушке с записанными страницами сайта. Клиенты
+в потоках в течение --duration секунд запрашивают --path (в {n} подставляется
+номер запроса, чтобы поиск не отвечал из кэша). Выводятся запросы в секунду,
+p50 и p99 задержки и число ошибок.
+
+Запуск: python -m benchmarks.load_test [--clients 16] [--duration 10] [--latency 0.05]
+        [--path "/api/search/гитара-{n}"] [--servers dev gunicorn]
+"""
+import argparse
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+from benchmarks.standin_server import RecordedSiteHandler, StandInServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Команды запуска приложения; {port} - порт приложения. Сервер разработки запускается,
+# как в app.py (с отладчиком), но без перезагрузчика, который порождает второй процесс
+SERVERS = {
+    'dev': [sys.executable, '-c',
+            "from app import create_app; create_app().run(port={port}, debug=True, use_reloader=False)"],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'wsgi:app'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(server, port, base_url, workdir, args):
+    """Процесс приложения; ждет, пока приложение начнет отвечать"""
+    env = dict(os.environ,
+               PYTHONPATH=ROOT,
+               JAZZ_SHOP_BASE_URL=base_url,
+               JAZZ_SHOP_REQUESTS_PER_SECOND='0',
+               JAZZ_SHOP_JOBS_DIR=os.path.join(workdir, 'jobs'),
+               JAZZ_SHOP_EXPORTS_DIR=os.path.join(workdir, 'exports'),
+               JAZZ_SHOP_PRODUCT_INDEX=os.path.join(workdir, 'products.sqlite'),
+               JAZZ_SHOP_BIND=f'127.0.0.1:{port}',
+               JAZZ_SHOP_WEB_WORKERS=str(args.workers),
+               JAZZ_SHOP_WEB_THREADS=str(args.threads),
+               JAZZ_SHOP_ACCESS_LOG='')
+    command = [part.format(port=port) for part in SERVERS[server]]
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/metrics', timeout=1)
+            return process
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Приложение ({server}) не запустилось")
+
+
+def run_load(url_template, clients, duration):
+    """Запросы от clients потоков в течение duration секунд; задержки успешных ответов и число ошибок"""
+    latencies = []
+    errors = [0]
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            with lock:
+                n = next(counter)
+            started = time.perf_counter()
+            try:
+                ok = session.get(url_template.format(n=n), timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - started
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    arg_parser.add_argument('--path', default='/api/search/гитара-{n}')
+    arg_parser.add_argument('--clients', type=int, default=16)
+    arg_parser.add_argument('--duration', type=float, default=10)
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='задержка ответа сайта-заглушки, с')
+    arg_parser.add_argument('--products', type=int, default=24, help='товаров на странице поиска')
+    arg_parser.add_argument('--workers', type=int, default=4, help='процессов gunicorn')
+    arg_parser.add_argument('--threads', type=int, default=16, help='потоков в процессе gunicorn')
+    args = arg_parser.parse_args()
+
+    site = StandInServer(latency=args.latency, products_per_page=args.products, handler=RecordedSiteHandler).start()
+    print(f"Сайт-заглушка: задержка {args.latency * 1000:.0f} мс, товаров на странице {args.products}; "
+          f"клиентов {args.clients}, {args.duration:.0f} с на режим, {args.path}")
+    print(f"{'сервер':>10}{'запросов':>10}{'ошибок':>8}{'запр./с':>10}{'p50, мс':>10}{'p99, мс':>10}")
+
+    try:
+        for server in args.servers:
+            if server == 'gunicorn' and importlib.util.find_spec('gunicorn') is None:
+                print(f"{server:>10}  не установлен (pip install gunicorn)")
+                continue
+
+            port = free_port()
+            with tempfile.TemporaryDirectory() as workdir:
+                process = start_app(server, port, site.base_url, workdir, args)
+                try:
+                    url_template = f'http://127.0.0.1:{port}' + quote(args.path, safe='/?=&{}')
+                    latencies, errors, elapsed = run_load(url_template, args.clients, args.duration)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+
+            print(f"{server:>10}{len(latencies):>10}{errors:>8}{len(latencies) / elapsed:>10.1f}"
+                  f"{percentile(latencies, 0.5) * 1000:>10.0f}{percentile(latencies, 0.99) * 1000:>10.0f}")
+    finally:
+        site.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Офлайн-набор бенчмарков: поиск, детальная информация и выгрузка в Excel
+
+Страницы поиска, категории и товара берутся из benchmarks/fixtures и отдаются
+локальным сервером с настраиваемой задержкой и долей ответов 503. Для каждого
+размера каталога измеряются пропускная способность search_products,
+get_detailed_info (через enrich_products) и save_to_excel, задержки этапов
+из гистограммы jazz_shop_stage_seconds и пиковая память (tracemalloc,
+отдельным проходом, чтобы трассировка не искажала время).
+
+Результаты можно сохранить (--save) и сравнить с прошлым запуском
+(--baseline): при падении пропускной способности больше чем на --tolerance
+скрипт завершается с кодом 1.
+
+Запуск: python -m benchmarks.run_suite [--sizes 20 100 500] [--latency 0.005]
+        [--error-rate 0.02] [--save results.json] [--baseline results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.standin_server import RecordedSiteHandler, StandInServer
+from metrics import STAGE_SECONDS
+from parser import JazzShopParser
+from site_state import SiteState
+
+OPERATIONS = ('search', 'detail', 'excel')
+# Этапы, задержки которых выводятся в отчете
+STAGES = ('fetch', 'decode', 'parse', 'find_products', 'detail_fetch', 'extract_description',
+          'extract_characteristics', 'save_to_excel')
+
+
+def quiet():
+    """Подавление диагностических сообщений парсера"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def stage_series():
+    return {stage: STAGE_SECONDS.series(stage=stage) for stage in STAGES}
+
+
+def quantile(counts, q):
+    """Верхняя граница корзины, в которую попадает квантиль q"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank, seen = q * total, 0
+    for bound, count in zip(STAGE_SECONDS.buckets, counts):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float('inf')
+
+
+def stage_report(before, after):
+    """Число вызовов, средняя задержка и p50/p95 каждого этапа за время прогона (мс)"""
+    report = {}
+    for stage in STAGES:
+        counts_before, sum_before, count_before = before[stage]
+        counts_after, sum_after, count_after = after[stage]
+        count = count_after - count_before
+        if not count:
+            continue
+        counts = [a - b for a, b in zip(counts_after, counts_before)]
+        report[stage] = {
+            'calls': count,
+            'mean_ms': (sum_after - sum_before) / count * 1000,
+            'p50_ms': quantile(counts, 0.5) * 1000,
+            'p95_ms': quantile(counts, 0.95) * 1000,
+        }
+    return report
+
+
+def run_operations(parser, repeat, workers, workdir):
+    """Поиск, детальная информация и выгрузка; возвращает время каждой операции и число товаров"""
+    timings = {operation: 0.0 for operation in OPERATIONS}
+    products = []
+    with quiet():
+        for i in range(repeat):
+            started = time.perf_counter()
+            products = parser.search_products('гитара')
+            timings['search'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            parser.enrich_products(products, max_workers=workers)
+            timings['detail'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            parser.save_to_excel(products, os.path.join(workdir, f'bench_{i}.xlsx'))
+            timings['excel'] += time.perf_counter() - started
+    return timings, len(products)
+
+
+def peak_memory(parser, workers, workdir):
+    """Пиковая память (МБ) каждой операции по tracemalloc"""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        with quiet():
+            tracemalloc.reset_peak()
+            products = parser.search_products('гитара')
+            peaks['search'] = tracemalloc.get_traced_memory()[1]
+
+            tracemalloc.reset_peak()
+            parser.enrich_products(products, max_workers=workers)
+            peaks['detail'] = tracemalloc.get_traced_memory()[1]
+
+            tracemalloc.reset_peak()
+            parser.save_to_excel(products, os.path.join(workdir, 'bench_memory.xlsx'))
+            peaks['excel'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {operation: peak / 1024 / 1024 for operation, peak in peaks.items()}
+
+
+def run_size(size, args, workdir):
+    server = StandInServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           products_per_page=size, handler=RecordedSiteHandler, seed=args.seed).start()
+    parser = JazzShopParser(base_url=server.base_url, cache=False, requests_per_second=args.rps,
+                            state=SiteState(os.path.join(workdir, f'state_{size}.json')),
+                            max_workers=args.workers, pool_size=args.workers * 2)
+    try:
+        # Прогрев: запоминается поисковый URL, загружаются модули выгрузки
+        with quiet():
+            parser.save_to_excel(parser.search_products('гитара')[:1], os.path.join(workdir, 'warmup.xlsx'))
+        server.reset_stats()
+
+        before = stage_series()
+        timings, found = run_operations(parser, args.repeat, args.workers, workdir)
+        stages = stage_report(before, stage_series())
+        http_requests, http_errors = server.requests, server.errors
+        memory = peak_memory(parser, args.workers, workdir)
+    finally:
+        parser.close()
+        server.shutdown()
+        server.server_close()
+
+    items = found * args.repeat
+    return {
+        'size': size,
+        'found': found,
+        # Товаров в секунду для каждой операции
+        'throughput': {operation: items / elapsed if elapsed else 0.0 for operation, elapsed in timings.items()},
+        'seconds': {operation: elapsed / args.repeat for operation, elapsed in timings.items()},
+        'peak_mb': memory,
+        'stages': stages,
+        'http_requests': http_requests,
+        'http_errors': http_errors,
+    }
+
+
+def print_result(result):
+    print(f"\nКаталог: {result['size']} товаров, найдено {result['found']}, "
+          f"HTTP-запросов {result['http_requests']} (503: {result['http_errors']})")
+    print(f"{'операция':>10}{'время, с':>10}{'товаров/с':>12}{'пик, МБ':>10}")
+    for operation in OPERATIONS:
+        print(f"{operation:>10}{result['seconds'][operation]:>10.3f}"
+              f"{result['throughput'][operation]:>12.1f}{result['peak_mb'][operation]:>10.1f}")
+    print(f"{'этап':>24}{'вызовов':>9}{'средн., мс':>12}{'p50, мс':>10}{'p95, мс':>10}")
+    for stage, stats in result['stages'].items():
+        print(f"{stage:>24}{stats['calls']:>9}{stats['mean_ms']:>12.2f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """Операции, пропускная способность которых упала больше чем на tolerance"""
+    previous = {entry['size']: entry for entry in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(result['size'])
+        if old is None:
+            continue
+        for operation in OPERATIONS:
+            before, after = old['throughput'].get(operation), result['throughput'][operation]
+            if before and after < before * (1 - tolerance):
+                regressions.append(f"{operation} (каталог {result['size']}): "
+                                   f"{before:.1f} -> {after:.1f} товаров/с ({after / before - 1:+.0%})")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 500])
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--latency', type=float, default=0.005)
+    arg_parser.add_argument('--jitter', type=float, default=0.0)
+    arg_parser.add_argument('--error-rate', type=float, default=0.0)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--workers', type=int, default=8)
+    arg_parser.add_argument('--rps', type=float, default=0, help='ограничение запросов в секунду (0 - без ограничения)')
+    arg_parser.add_argument('--save', help='сохранить результаты в JSON')
+    arg_parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2)
+    args = arg_parser.parse_args()
+
+    print(f"Задержка {args.latency * 1000:.0f} мс (+ до {args.jitter * 1000:.0f} мс), "
+          f"ошибки 503: {args.error_rate:.0%}, потоков: {args.workers}, повторов: {args.repeat}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            result = run_size(size, args, workdir)
+            print_result(result)
+            results.append(result)
+
+    report = {'settings': {key: value for key, value in vars(args).items() if key not in ('save', 'baseline')},
+              'results': results}
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nПадение пропускной способности:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nРегрессий относительно {args.baseline} нет (допуск {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
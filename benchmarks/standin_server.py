@@ -0,0 +1,178 @@
+"""Локальный HTTP-сервер, подменяющий jazz-shop.ru в бенчмарках
+
+StandInHandler отдает синтетические страницы, RecordedSiteHandler - записанные
+страницы сайта из benchmarks/fixtures (поиск, листинг категории, страница
+товара). Сервер умеет добавлять задержку и отвечать ошибками 503.
+"""
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+CARD_RE = re.compile(r'    <div class="catalog-item" data-id="\d+">.*?\n    </div>\n', re.S)
+CARD_LINK_RE = re.compile(r'href="(/catalog/[^"?]+?)/"')
+CARD_ARTICLE_RE = re.compile(r'Арт\. ([\w-]+)')
+
+PRODUCT_CARD = (
+    '<div class="product">'
+    '<a class="name" href="/product/{id}/">Гитара Yamaha F{id}</a>'
+    '<span class="brand">Yamaha</span>'
+    '<span class="price">{price} руб.</span>'
+    '<span>В наличии</span> <span>Арт. YF-{id}</span>'
+    '</div>'
+)
+
+PRODUCT_PAGE = (
+    '<html><body><h1>Гитара Yamaha F{id}</h1>'
+    '<div class="description">Акустическая гитара Yamaha F{id} с ельной верхней декой.</div>'
+    '<table><tr><td>Корпус</td><td>Дредноут</td></tr><tr><td>Струны</td><td>Металл</td></tr></table>'
+    '</body></html>'
+)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.requests += 1
+            fail = server.error_rate and server.random.random() < server.error_rate
+            delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            with server.stats_lock:
+                server.errors += 1
+            self._send(503, 'Сервис временно недоступен'.encode('utf-8'), {'Retry-After': '0'})
+            return
+
+        self._send(200, self.page(urlsplit(self.path)).encode('utf-8'))
+
+    def page(self, url):
+        """HTML-страница для адреса запроса"""
+        if url.path.startswith('/product/'):
+            product_id = url.path.strip('/').split('/')[-1]
+            return PRODUCT_PAGE.format(id=product_id)
+        cards = ''.join(PRODUCT_CARD.format(id=i, price=10000 + i * 100)
+                        for i in range(self.server.products_per_page))
+        return f'<html><body><div class="catalog">{cards}</div></body></html>'
+
+    def _send(self, status, data, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def read_fixture_file(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class RecordedSite:
+    """Записанные страницы сайта, размноженные до нужного числа товаров
+
+    Карточки берутся из записанной страницы поиска по кругу; ссылка и артикул
+    каждой копии получают номер, поэтому все товары различаются.
+    """
+
+    def __init__(self):
+        search = read_fixture_file('search_catalog.html')
+        listing = read_fixture_file('catalog_listing.html')
+        self.cards = CARD_RE.findall(search)
+        self.search_parts = self._split(search)
+        self.listing_parts = self._split(listing)
+        self.product_page = read_fixture_file('product_page.html')
+
+    def _split(self, html):
+        """Страница без карточек: часть до списка и после него"""
+        cards = list(CARD_RE.finditer(html))
+        return html[:cards[0].start()], html[cards[-1].end():]
+
+    def card(self, number):
+        card = self.cards[number % len(self.cards)]
+        card = CARD_LINK_RE.sub(lambda m: f'href="{m.group(1)}-{number}/"', card)
+        return CARD_ARTICLE_RE.sub(lambda m: f'Арт. {m.group(1)}-{number}', card)
+
+    def search_page(self, count):
+        head, tail = self.search_parts
+        return head + ''.join(self.card(i) for i in range(count)) + tail
+
+    def listing_page(self, page, per_page, total):
+        head, tail = self.listing_parts
+        start = (page - 1) * per_page
+        return head + ''.join(self.card(i) for i in range(start, min(start + per_page, total))) + tail
+
+    def product(self, slug):
+        return self.product_page.replace('EP10494', slug.upper())
+
+
+class RecordedSiteHandler(StandInHandler):
+    """Записанные страницы: поиск со всеми товарами каталога, листинги по 24 товара, страницы товаров
+
+    Размер каталога - products_per_page сервера.
+    """
+
+    LISTING_PAGE_SIZE = 24
+
+    def page(self, url):
+        server = self.server
+        parts = [part for part in url.path.split('/') if part]
+        if parts[:1] != ['catalog'] or parts[1:2] == ['search']:
+            return server.site.search_page(server.products_per_page)
+        if len(parts) >= 3:
+            return server.site.product(parts[-1])
+        if len(parts) == 2:
+            page = int(parse_qs(url.query).get('PAGEN_1', ['1'])[0])
+            return server.site.listing_page(page, self.LISTING_PAGE_SIZE, server.products_per_page)
+        return server.site.search_page(server.products_per_page)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, products_per_page=20, handler=StandInHandler, jitter=0.0, error_rate=0.0,
+                 seed=0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        # Случайная добавка к задержке (до jitter секунд) и доля ответов 503
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.products_per_page = products_per_page
+        self.site = RecordedSite() if issubclass(handler, RecordedSiteHandler) else None
+        self.stats_lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.connections = 0
+            self.requests = 0
+            self.errors = 0
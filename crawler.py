@@ -0,0 +1,242 @@
+"""Обход всего каталога с пагинацией и продолжением после остановки
+
+Запуск: python crawler.py -o catalog.xlsx [--workers 4] [--rps 2] [--max-pages N] [--restart]
+Состояние обхода периодически сохраняется в файл; повторный запуск
+продолжает обход с того места, где он был прерван.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit
+
+from http_policy import CircuitOpenError
+from parser import JazzShopParser
+from product import product_key
+
+# Минимальная пауза после отказа размыкателя: пока идет пробный запрос другого потока, retry_after равен 0
+CIRCUIT_MIN_PAUSE = 1.0
+
+
+def url_hash(value):
+    """Компактный 64-битный отпечаток строки для множества просмотренных"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class CatalogCrawler:
+    """Обход каталога: очередь страниц, ограниченная параллельность, контрольные точки"""
+
+    def __init__(self, parser, state_path='crawl_state.json', products_path='crawl_products.jsonl',
+                 max_workers=4, max_pages=None, checkpoint_every=20):
+        self.parser = parser
+        self.state_path = state_path
+        self.products_path = products_path
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.checkpoint_every = checkpoint_every
+        self.host = urlsplit(parser.base_url).netloc
+
+        self.frontier = deque()
+        self.seen_urls = set()
+        self.seen_products = set()
+        self.pages_done = 0
+        self.products_found = 0
+        self._run_start = 0
+
+    def start(self, restart=False):
+        """Загрузка контрольной точки или начало обхода с главной страницы"""
+        if not restart and self._load_checkpoint():
+            print(f"Продолжаем обход: страниц обработано {self.pages_done}, в очереди {len(self.frontier)}")
+            return
+
+        if os.path.exists(self.products_path):
+            os.remove(self.products_path)
+        self._enqueue(self.parser.base_url + '/')
+
+    def run(self):
+        """Обход до исчерпания очереди или лимита страниц"""
+        in_flight = {}
+        self._run_start = self.pages_done
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            with open(self.products_path, 'a', encoding='utf-8') as products_file:
+                while self.frontier or in_flight:
+                    # Очередь ограничена числом одновременных загрузок
+                    while self.frontier and len(in_flight) < self.max_workers and not self._limit_reached(in_flight):
+                        url = self.frontier.popleft()
+                        in_flight[executor.submit(self._crawl_page, url)] = url
+
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url = in_flight.pop(future)
+                        try:
+                            products, links = future.result()
+                        except CircuitOpenError as e:
+                            # Страница возвращается в очередь, обход продолжится после паузы
+                            print(e)
+                            self.frontier.appendleft(url)
+                            time.sleep(max(e.retry_after, CIRCUIT_MIN_PAUSE))
+                            continue
+                        self._record(products, links, products_file)
+                        self.pages_done += 1
+                        if self.pages_done % self.checkpoint_every == 0:
+                            products_file.flush()
+                            self._save_checkpoint(in_flight.values())
+                            print(f"Страниц: {self.pages_done}, товаров: {self.products_found}, "
+                                  f"в очереди: {len(self.frontier)}")
+        except KeyboardInterrupt:
+            print("Обход прерван, сохраняем состояние...")
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._save_checkpoint(in_flight.values())
+
+        print(f"Обход завершен: страниц {self.pages_done}, товаров {self.products_found}")
+
+    def iter_products(self):
+        """Товары, собранные за весь обход
+
+        После аварийной остановки страницы с последней контрольной точки
+        обходятся повторно, поэтому дубли в файле товаров пропускаются.
+        """
+        if not os.path.exists(self.products_path):
+            return
+        seen = set()
+        with open(self.products_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                product = json.loads(line)
+                key_hash = url_hash(product_key(product) or line)
+                if key_hash not in seen:
+                    seen.add(key_hash)
+                    yield product
+
+    def _limit_reached(self, in_flight):
+        pages = self.pages_done - self._run_start + len(in_flight)
+        return self.max_pages is not None and pages >= self.max_pages
+
+    def _crawl_page(self, url):
+        """Загрузка страницы: товары и ссылки на пагинацию и категории"""
+        try:
+            response = self.parser._get(url)
+            response.raise_for_status()
+            soup = self.parser._make_soup(response)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"Ошибка при запросе {url}: {e}")
+            return [], []
+
+        products = self.parser._find_products(soup, limit=None)
+        product_links = {self._canonical_url(url, product.url) for product in products if product.url}
+        rules = self.parser.rules
+
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = self._canonical_url(url, link['href'])
+            parts = urlsplit(href)
+            if parts.netloc != self.host or href in product_links:
+                continue
+            if parts.query or rules.category_url.search(parts.path):
+                links.append(href)
+        for link in rules.pagination_selector.select(soup):
+            links.append(self._canonical_url(url, link.get('href', '')))
+
+        return products, links
+
+    def _canonical_url(self, base, href):
+        """Абсолютный URL без якоря и без параметров, кроме параметров пагинации
+
+        Сортировка, фильтры и метки (?sort=price, utm_*) дают ту же страницу
+        под другим адресом, и без очистки каждая из них обходилась бы заново.
+        """
+        parts = urlsplit(urldefrag(urljoin(base, href))[0])
+        pagination_url = self.parser.rules.pagination_url
+        query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                 if pagination_url.search(f'?{key}={value}')]
+        return parts._replace(query=urlencode(query)).geturl()
+
+    def _record(self, products, links, products_file):
+        for product in products:
+            # Карточки без ссылки или названия (баннеры, пустые блоки) в каталог не пишутся
+            if not product.url or not product.name:
+                continue
+            key = product_key(product)
+            key_hash = url_hash(key)
+            if key_hash in self.seen_products:
+                continue
+            self.seen_products.add(key_hash)
+            products_file.write(json.dumps(product.to_dict(), ensure_ascii=False) + '\n')
+            self.products_found += 1
+
+        for link in links:
+            if urlsplit(link).netloc == self.host:
+                self._enqueue(link)
+
+    def _enqueue(self, url):
+        url_key = url_hash(url)
+        if url_key not in self.seen_urls:
+            self.seen_urls.add(url_key)
+            self.frontier.append(url)
+
+    def _save_checkpoint(self, in_flight_urls=()):
+        """Атомарная запись состояния обхода; незавершенные страницы возвращаются в очередь"""
+        state = {
+            'base_url': self.parser.base_url,
+            'pages_done': self.pages_done,
+            'products_found': self.products_found,
+            'frontier': list(in_flight_urls) + list(self.frontier),
+            'seen_urls': list(self.seen_urls),
+            'seen_products': list(self.seen_products),
+        }
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if state.get('base_url') != self.parser.base_url or not state.get('frontier'):
+            return False
+
+        self.pages_done = state['pages_done']
+        self.products_found = state['products_found']
+        self.frontier = deque(state['frontier'])
+        self.seen_urls = set(state['seen_urls'])
+        self.seen_products = set(state['seen_products'])
+        return True
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Обход каталога Jazz Shop")
+    arg_parser.add_argument('-o', '--output', default='jazz_shop_catalog.xlsx', help="Файл Excel для результатов")
+    arg_parser.add_argument('--state', default='crawl_state.json', help="Файл контрольной точки")
+    arg_parser.add_argument('--products', default='crawl_products.jsonl', help="Файл собранных товаров")
+    arg_parser.add_argument('--workers', type=int, default=4, help="Число одновременных загрузок")
+    arg_parser.add_argument('--rps', type=float, default=2, help="Ограничение запросов в секунду к сайту")
+    arg_parser.add_argument('--max-pages', type=int, default=None, help="Остановиться после N страниц")
+    arg_parser.add_argument('--restart', action='store_true', help="Начать обход заново")
+    args = arg_parser.parse_args()
+
+    with JazzShopParser(requests_per_second=args.rps) as parser:
+        crawler = CatalogCrawler(parser, state_path=args.state, products_path=args.products,
+                                 max_workers=args.workers, max_pages=args.max_pages)
+        crawler.start(restart=args.restart)
+        crawler.run()
+        parser.save_to_excel(crawler.iter_products(), args.output)
+
+
+if __name__ == '__main__':
+    main()
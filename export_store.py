@@ -0,0 +1,198 @@
+"""Каталог выгрузок с именами по содержимому и фоновым вытеснением
+
+Результаты поиска сохраняются в <ключ>.json, где ключ - хэш самих товаров,
+поэтому одинаковые наборы результатов используют одни и те же файлы.
+Файлы выгрузки (<ключ>.xlsx, <ключ>.csv...) создаются при первом запросе
+и удаляются фоновым потоком по возрасту и общему размеру каталога; после
+вытеснения выгрузка создается заново из сохраненных результатов.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from exporters import EXPORTERS, export_products, get_exporter
+from product import Product
+
+KEY_RE = re.compile(r'^[0-9a-f]{20}$')
+RESULTS_SUFFIX = '.json'
+
+
+def export_filename(query, extension='xlsx', when=None):
+    """Имя файла выгрузки для поискового запроса"""
+    timestamp = (when or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    safe_query = "".join(x for x in query if x.isalnum() or x in (' ', '-', '_')).rstrip()
+    return f"jazz_shop_{safe_query}_{timestamp}.{extension}"
+
+
+def result_rows(products):
+    """Товары в виде словарей с русскими ключами"""
+    return [product.to_dict() if isinstance(product, Product) else dict(product) for product in products]
+
+
+class ExportStore:
+    """Выгрузки результатов поиска в отдельном каталоге
+
+    max_bytes и max_age ограничивают файлы выгрузки, results_max_age -
+    сохраненные результаты, по которым выгрузки создаются заново.
+    Вытеснение выполняется фоновым потоком раз в interval секунд.
+    """
+
+    def __init__(self, directory='exports', max_bytes=200 * 1024 * 1024, max_age=60 * 60,
+                 results_max_age=24 * 60 * 60, interval=5 * 60):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.results_max_age = results_max_age
+        self.interval = interval
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Блокировки создания отдельных файлов: один файл не пишется двумя потоками сразу
+        self._file_locks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск фонового вытеснения"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._evict_periodically, name='export-eviction', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _evict_periodically(self):
+        while True:
+            try:
+                self.evict()
+            except OSError as e:
+                print(f"Ошибка очистки выгрузок: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def key(self, rows):
+        """Ключ набора результатов: хэш товаров"""
+        data = json.dumps(rows, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()[:20]
+
+    def filename(self, key, fmt='xlsx'):
+        return key + '.' + get_exporter(fmt).extension
+
+    def _path(self, key, suffix):
+        if not KEY_RE.match(key):
+            raise ValueError(f"Некорректный ключ выгрузки: {key}")
+        return os.path.join(self.directory, key + suffix)
+
+    def put(self, products, title):
+        """Сохранение результатов поиска; возвращает ключ выгрузки
+
+        Если такие же результаты уже сохранены, новый файл не создается.
+        """
+        rows = result_rows(products)
+        key = self.key(rows)
+        path = self._path(key, RESULTS_SUFFIX)
+        with self._file_lock(path):
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                record = {'title': title, 'created_at': time.time(), 'products': rows}
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(record, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+        return key
+
+    def results(self, key):
+        """Сохраненные результаты (title, created_at, products) или None, если они вытеснены"""
+        try:
+            with open(self._path(key, RESULTS_SUFFIX), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def path(self, key, fmt='xlsx'):
+        """Путь к выгрузке в формате fmt; отсутствующий файл создается из сохраненных результатов
+
+        Если результаты уже вытеснены, выбрасывается FileNotFoundError.
+        """
+        path = self._path(key, '.' + get_exporter(fmt).extension)
+        with self._file_lock(path):
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+
+            record = self.results(key)
+            if record is None:
+                raise FileNotFoundError(f"Выгрузка {key} устарела")
+
+            print(f"Создаем выгрузку {os.path.basename(path)}")
+            export_products(record['products'], path, fmt)
+            return path
+
+    def download_name(self, key, fmt='xlsx'):
+        """Понятное имя файла для скачивания: запрос и время поиска"""
+        record = self.results(key) or {}
+        when = datetime.fromtimestamp(record['created_at']) if record.get('created_at') else None
+        return export_filename(record.get('title') or 'export', get_exporter(fmt).extension, when)
+
+    def _file_lock(self, path):
+        with self._lock:
+            return self._file_locks.setdefault(path, threading.Lock())
+
+    def evict(self, now=None):
+        """Удаление устаревших файлов и самых старых выгрузок сверх max_bytes; возвращает число удаленных"""
+        now = now or time.time()
+        extensions = {'.' + exporter.extension for exporter in EXPORTERS.values()}
+        exports = []
+        removed = 0
+
+        for entry in os.scandir(self.directory):
+            # Файлы с другими именами (например, сохраненные ExcelHandler) не трогаем
+            if not entry.is_file() or not KEY_RE.match(entry.name.split('.', 1)[0]):
+                continue
+            stat = entry.stat()
+            age = now - stat.st_mtime
+            suffix = os.path.splitext(entry.name)[1]
+            if suffix == RESULTS_SUFFIX:
+                expired = age > self.results_max_age
+            elif suffix in extensions:
+                expired = age > self.max_age
+                if not expired:
+                    exports.append((stat.st_mtime, stat.st_size, entry.path))
+            else:
+                # Временные файлы прерванной записи
+                expired = suffix == '.tmp' and age > self.max_age
+            if expired and self._remove(entry.path):
+                removed += 1
+
+        # Самые давно использованные выгрузки удаляются, пока каталог не уложится в max_bytes
+        total = sum(size for _, size, _ in exports)
+        for _, size, path in sorted(exports):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                removed += 1
+                total -= size
+
+        if removed:
+            self.evictions += removed
+            print(f"Удалено устаревших выгрузок: {removed}")
+        return removed
+
+    def _remove(self, path):
+        with self._file_lock(path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        with self._lock:
+            self._file_locks.pop(path, None)
+        return True
@@ -0,0 +1,263 @@
+"""Выгрузка товаров в файлы разных форматов
+
+Форматы регистрируются в EXPORTERS через register_exporter. Все писатели
+потоковые: товары могут приходить из генератора, в памяти держится не
+больше одной строки (для Parquet - одной пачки строк). Библиотеки форматов
+(openpyxl, pyarrow) импортируются только при первой записи в этот формат.
+"""
+import csv
+import importlib.util
+import json
+import os
+import re
+import threading
+from itertools import chain, islice
+
+from metrics import span
+from product import PRODUCT_SCHEMA, Product
+
+# Колонки выгрузки
+EXPORT_HEADERS = [key for key, _, _, _ in PRODUCT_SCHEMA]
+# Английские ключи товара (атрибуты Product) -> колонки выгрузки
+ENGLISH_KEYS = {attr: key for key, attr, _, _ in PRODUCT_SCHEMA}
+# Колонки листа Excel с результатами
+EXCEL_HEADERS = EXPORT_HEADERS
+# Число первых строк, по которым рассчитывается ширина колонок
+EXCEL_WIDTH_SAMPLE = 200
+# Число строк в одной группе строк Parquet
+PARQUET_BATCH_SIZE = 5000
+
+# Символы, недопустимые в названии листа Excel
+SHEET_TITLE_INVALID_RE = re.compile(r'[\[\]:*?/\\]')
+
+
+class ExportError(Exception):
+    """Формат выгрузки неизвестен или недоступен"""
+
+
+class Exporter:
+    """Формат выгрузки: расширение файла, MIME-тип и функция записи"""
+
+    def __init__(self, name, extension, mimetype, write, requires=None):
+        self.name = name
+        self.extension = extension
+        self.mimetype = mimetype
+        self.write = write
+        self.requires = requires
+
+    @property
+    def available(self):
+        """Установлен ли необязательный пакет, нужный формату"""
+        return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+
+EXPORTERS = {}
+
+
+def register_exporter(name, extension, mimetype, requires=None):
+    """Декоратор регистрации функции write(products, filename) -> число строк"""
+    def decorator(write):
+        EXPORTERS[name] = Exporter(name, extension, mimetype, write, requires)
+        return write
+    return decorator
+
+
+def get_exporter(name):
+    exporter = EXPORTERS.get((name or '').lower())
+    if exporter is None:
+        raise ExportError(f"Неизвестный формат выгрузки: {name}. Доступны: {', '.join(EXPORTERS)}")
+    return exporter
+
+
+def available_formats():
+    """Форматы, для которых установлены все нужные пакеты"""
+    return [name for name, exporter in EXPORTERS.items() if exporter.available]
+
+
+def export_products(products, filename, fmt='xlsx'):
+    """Запись товаров в файл выбранного формата; возвращает число строк"""
+    exporter = get_exporter(fmt)
+    with span('export_' + exporter.name):
+        return exporter.write(products, filename)
+
+
+def export_sheets(sheets, filename):
+    """Запись книги Excel с листом на каждый набор товаров ({название: товары}); возвращает число строк"""
+    with span('export_xlsx'):
+        return write_xlsx_sheets(sheets, filename)
+
+
+def from_english_keys(product):
+    """Товар с английскими ключами (name, price, url...) в виде словаря с колонками выгрузки"""
+    return {ENGLISH_KEYS.get(key, key): value for key, value in product.items()}
+
+
+def typed_row(product):
+    """Товар по схеме PRODUCT_SCHEMA: числовая цена, None вместо заглушек, словарь характеристик"""
+    if not isinstance(product, Product):
+        product = Product.from_dict(product)
+    row = {key: getattr(product, attr) for key, attr, _, _ in PRODUCT_SCHEMA}
+    row['Характеристики'] = row['Характеристики'] or None
+    return row
+
+
+def _atomic_write(filename, write):
+    """Запись во временный файл с заменой целевого только после успешного завершения"""
+    tmp_path = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        count = write(tmp_path)
+        os.replace(tmp_path, filename)
+        return count
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@register_exporter('csv', 'csv', 'text/csv')
+def write_csv(products, filename):
+    """CSV в UTF-8 с BOM (для Excel); пустые ячейки вместо заглушек, цена числом"""
+    def write(path):
+        count = 0
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_HEADERS)
+            for product in products:
+                row = typed_row(product)
+                if row['Характеристики'] is not None:
+                    row['Характеристики'] = json.dumps(row['Характеристики'], ensure_ascii=False)
+                writer.writerow(['' if row[header] is None else row[header] for header in EXPORT_HEADERS])
+                count += 1
+        return count
+
+    return _atomic_write(filename, write)
+
+
+@register_exporter('jsonl', 'jsonl', 'application/x-ndjson')
+def write_jsonl(products, filename):
+    """Один товар на строку с типизированными значениями"""
+    def write(path):
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for product in products:
+                f.write(json.dumps(typed_row(product), ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+    return _atomic_write(filename, write)
+
+
+@register_exporter('parquet', 'parquet', 'application/vnd.apache.parquet', requires='pyarrow')
+def write_parquet(products, filename, batch_size=PARQUET_BATCH_SIZE):
+    """Parquet с типизированными колонками; требует установленного pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Для выгрузки в Parquet установите pyarrow")
+
+    types = {'string': pa.string(), 'float': pa.float64(), 'map': pa.map_(pa.string(), pa.string())}
+    schema = pa.schema([(key, types[kind]) for key, _, kind, _ in PRODUCT_SCHEMA])
+
+    def write(path):
+        count = 0
+        rows = (typed_row(product) for product in products)
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                for row in batch:
+                    if row['Характеристики'] is not None:
+                        row['Характеристики'] = [(str(k), str(v)) for k, v in row['Характеристики'].items()]
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+        return count
+
+    return _atomic_write(filename, write)
+
+
+def excel_sheet_title(query, used_titles):
+    """Уникальное допустимое название листа Excel для запроса"""
+    base = SHEET_TITLE_INVALID_RE.sub(' ', query).strip()[:31] or "Запрос"
+    title = base
+    number = 2
+    while title.lower() in used_titles:
+        suffix = f" ({number})"
+        title = base[:31 - len(suffix)] + suffix
+        number += 1
+    used_titles.add(title.lower())
+    return title
+
+
+def excel_rows(products):
+    return ([product.get(header, '') for header in EXCEL_HEADERS] for product in products)
+
+
+def write_workbook(filename, sheets):
+    """Запись листов (название, первые строки, остальные строки) в книгу write-only"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    count = 0
+
+    for title, sample, rows in sheets:
+        ws_products = wb.create_sheet(title)
+
+        # Ширина колонок задается до записи строк
+        for col, header in enumerate(EXCEL_HEADERS):
+            max_length = max([len(header)] + [len(str(row[col])) for row in sample])
+            ws_products.column_dimensions[get_column_letter(col + 1)].width = min(max_length + 2, 50)
+
+        # Заголовки
+        header_cells = []
+        for header in EXCEL_HEADERS:
+            cell = WriteOnlyCell(ws_products, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+            header_cells.append(cell)
+        ws_products.append(header_cells)
+
+        # Данные
+        for row in chain(sample, rows):
+            ws_products.append(row)
+            count += 1
+
+    wb.save(filename)
+    return count
+
+
+@register_exporter('xlsx', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                   requires='openpyxl')
+def write_xlsx(products, filename, width_sample=EXCEL_WIDTH_SAMPLE):
+    """Потоковая запись книги Excel с одним листом; ширина колонок - по первым width_sample строкам"""
+    return write_xlsx_sheets({"Товары": products}, filename, width_sample)
+
+
+def write_xlsx_sheets(sheets, filename, width_sample=EXCEL_WIDTH_SAMPLE):
+    """Потоковая запись книги Excel с отдельным листом на каждый набор товаров ({название: товары})"""
+    used_titles = set()
+    prepared = []
+    for title, products in sheets.items():
+        rows = excel_rows(products)
+        sample = list(islice(rows, width_sample))
+        prepared.append((excel_sheet_title(title, used_titles), sample, rows))
+    return _atomic_write(filename, lambda path: write_workbook(path, prepared))
+
+
+def read_xlsx(filename):
+    """Товары из первого листа книги, сохраненной write_xlsx"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filename, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        headers = next(rows, None)
+        if not headers:
+            return
+        for row in rows:
+            yield {header: ('' if value is None else value) for header, value in zip(headers, row)}
+    finally:
+        wb.close()
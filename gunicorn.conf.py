@@ -0,0 +1,43 @@
+"""Настройки gunicorn для работы под нагрузкой
+
+Запуск: gunicorn -c gunicorn.conf.py wsgi:app
+
+Воркеры gthread: запрос, ожидающий ответа сайта, занимает поток, а не
+процесс, поэтому один воркер обслуживает threads запросов одновременно
+(в том числе долгие потоки /stream). Отдельных асинхронных маршрутов нет:
+HTTP-клиент requests блокирующий, и корутина поверх него все равно занимала бы
+поток на время загрузки. Несколько процессов нужны для разбора HTML на
+нескольких ядрах.
+
+Каждый воркер - отдельный процесс со своими парсером, менеджером заданий
+и метриками: задания выполняются тем воркером, который их принял (статус
+читается с диска любым воркером), /metrics показывает только счетчики
+ответившего воркера, а полнотекстовый индекс (?source=local) перед каждым
+поиском подгружает из общей базы SQLite товары, сохраненные другими воркерами.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('JAZZ_SHOP_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('JAZZ_SHOP_WEB_WORKERS', min(4, multiprocessing.cpu_count() * 2)))
+worker_class = 'gthread'
+threads = int(os.environ.get('JAZZ_SHOP_WEB_THREADS', 16))
+# Таймаут проверки жизни воркера; на длительность отдельных запросов у gthread не влияет
+timeout = int(os.environ.get('JAZZ_SHOP_WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Периодический перезапуск воркеров (ограничивает рост памяти) по умолчанию выключен:
+# страница задания опрашивает статус раз в секунду, и перезапуск прерывал бы задания
+# воркера; при включении задания дорабатывают в пределах graceful_timeout
+max_requests = int(os.environ.get('JAZZ_SHOP_WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+# Пулы соединений, SQLite и фоновые потоки создаются в каждом воркере после fork
+preload_app = False
+# Журнал запросов: '-' - stdout, пустая строка отключает журнал
+accesslog = os.environ.get('JAZZ_SHOP_ACCESS_LOG', '-') or None
+
+
+def worker_exit(server, worker):
+    """Завершение заданий воркера и закрытие соединений при его остановке"""
+    from app import close_parser
+    close_parser()
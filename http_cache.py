@@ -0,0 +1,204 @@
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+
+class CachedResponse:
+    """Ответ из кэша с интерфейсом, совместимым с requests.Response"""
+
+    def __init__(self, url, status_code, content, encoding, headers):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} для URL: {self.url}")
+
+
+class ResponseCache:
+    """Дисковый кэш HTTP-ответов (SQLite) с TTL, ревалидацией и LRU-вытеснением"""
+
+    # Время жизни записей по классам URL, в секундах
+    DEFAULT_TTLS = {
+        'search': 15 * 60,
+        # Страницы категорий и пагинации: цены и наличие в них меняются так же часто, как в поиске
+        'listing': 15 * 60,
+        'home': 60 * 60,
+        'product': 24 * 60 * 60,
+    }
+
+    # Заголовки ответа, которые сохраняются в кэше
+    STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+    def __init__(self, path='jazz_shop_cache.sqlite', max_bytes=200 * 1024 * 1024, ttls=None, rules=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        # Правила извлечения (rules.ExtractorRules): по их шаблонам category_url и
+        # pagination_url распознаются страницы каталога; без правил они считаются товарами
+        self.rules = rules
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                content BLOB NOT NULL,
+                encoding TEXT,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def classify(self, url):
+        """Определение класса URL для выбора TTL"""
+        parts = urlsplit(url)
+        path = parts.path.rstrip('/')
+        if not path:
+            return 'home'
+        if '/search' in path:
+            return 'search'
+        if self.rules is not None and ((parts.query and self.rules.pagination_url.search('?' + parts.query))
+                                       or self.rules.category_url.search(parts.path)):
+            return 'listing'
+        return 'product'
+
+    def fetch(self, url, request):
+        """Получение ответа из кэша или через функцию request(url, headers=...)"""
+        entry = self._load(url)
+        now = time.time()
+
+        if entry and now - entry['fetched_at'] < self.ttls[self.classify(url)]:
+            self._touch(url, now)
+            with self._lock:
+                self.hits += 1
+            return self._to_response(url, entry)
+
+        # Условный запрос, если у устаревшей записи есть валидаторы
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = request(url, headers=headers) if headers else request(url)
+
+        if entry and response.status_code == 304:
+            self._touch(url, now, refreshed=True)
+            with self._lock:
+                self.revalidated += 1
+            return self._to_response(url, entry)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200:
+            self._store(url, response, now)
+        return response
+
+    def stats(self):
+        """Счетчики попаданий и промахов кэша"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'evictions': self.evictions,
+                'bytes': self._total_bytes,
+            }
+
+    def clear(self):
+        """Удаление всех записей кэша"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, content, encoding, content_type, etag, last_modified, fetched_at "
+                "FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        keys = ('status', 'content', 'encoding', 'content_type', 'etag', 'last_modified', 'fetched_at')
+        return dict(zip(keys, row))
+
+    def _touch(self, url, now, refreshed=False):
+        with self._lock:
+            if refreshed:
+                self._conn.execute("UPDATE responses SET accessed_at = ?, fetched_at = ? WHERE url = ?",
+                                   (now, now, url))
+            else:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+
+    def _store(self, url, response, now):
+        content = response.content
+        size = len(content)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, status, content, encoding, content_type, etag, last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, content, response.encoding,
+                 response.headers.get('Content-Type'), response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), now, now, size)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Вытеснение давно не использованных записей при превышении размера"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall()
+        for url, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def _to_response(self, url, entry):
+        headers = {
+            'Content-Type': entry['content_type'],
+            'ETag': entry['etag'],
+            'Last-Modified': entry['last_modified'],
+        }
+        headers = {key: value for key, value in headers.items() if value}
+        return CachedResponse(url, entry['status'], entry['content'], entry['encoding'], headers)
@@ -0,0 +1,213 @@
+"""Политика HTTP-запросов к сайту
+
+Ограничение частоты (token bucket на каждый хост), повторы с экспоненциальной
+задержкой и случайным разбросом при 429/5xx и сетевых ошибках, учет заголовка
+Retry-After, размыкатель цепи, который сразу отклоняет запросы, пока сайт
+недоступен, и раздельные таймауты соединения и чтения.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import CIRCUIT_REJECTIONS, UPSTREAM_RESPONSES, UPSTREAM_RETRIES
+
+# Коды ответа, после которых запрос повторяется
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Запрос отклонен без обращения к сайту: цепь разомкнута после серии ошибок"""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"Сайт {host} временно недоступен, повтор через {retry_after:.0f} с")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Ведро токенов: в среднем rate запросов в секунду, всплески до burst запросов"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Ожидание токена; токен резервируется сразу, поэтому потоки не обгоняют друг друга"""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для одного хоста
+
+    После failure_threshold ошибок подряд цепь размыкается на reset_timeout
+    секунд. Затем пропускается один пробный запрос: успех замыкает цепь,
+    ошибка снова размыкает ее.
+    """
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half_open'
+
+    def before_request(self):
+        """Разрешение на запрос или CircuitOpenError"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._probe_in_flight:
+                raise CircuitOpenError(self.host, max(remaining, 0.0))
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probe_in_flight or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class RequestPolicy:
+    """GET-запросы через сессию requests с ограничением частоты, повторами и размыкателем цепи"""
+
+    def __init__(self, session, requests_per_second=10, burst=None, connect_timeout=5.0, read_timeout=15.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, failure_threshold=5, reset_timeout=30.0):
+        self.session = session
+        self.requests_per_second = requests_per_second
+        self.burst = burst or max(1, int(requests_per_second or 1))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            return bucket
+
+    def breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def get(self, url, **kwargs):
+        """GET-запрос с повторами
+
+        Возвращает ответ (в том числе с ошибочным кодом, если повторы исчерпаны)
+        или выбрасывает последнее сетевое исключение; прочие исключения сессии
+        выбрасываются без повторов. Пока цепь хоста разомкнута,
+        сразу выбрасывается CircuitOpenError.
+        """
+        host = urlsplit(url).netloc
+        bucket = self.bucket(host)
+        breaker = self.breaker(host)
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+
+        attempt = 0
+        while True:
+            try:
+                breaker.before_request()
+            except CircuitOpenError:
+                CIRCUIT_REJECTIONS.inc(host=host)
+                raise
+            bucket.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                UPSTREAM_RESPONSES.inc(status=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                reason = 'timeout' if isinstance(e, requests.Timeout) else 'connection'
+                delay = self._backoff(attempt)
+            except Exception as e:
+                # Остальные ошибки (оборванный ответ, слишком много перенаправлений...) не повторяются,
+                # но тоже завершают пробный запрос, иначе цепь осталась бы разомкнутой навсегда
+                breaker.record_failure()
+                UPSTREAM_RESPONSES.inc(status=type(e).__name__)
+                raise
+            else:
+                UPSTREAM_RESPONSES.inc(status=str(response.status_code))
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                # 429 означает, что сайт работает, но просит снизить частоту запросов
+                if response.status_code == 429:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                if attempt >= self.max_retries:
+                    return response
+                reason = str(response.status_code)
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+
+            attempt += 1
+            UPSTREAM_RETRIES.inc(reason=reason)
+            print(f"Повтор {attempt}/{self.max_retries} запроса {url} через {delay:.1f} с")
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        """Экспоненциальная задержка с полным случайным разбросом"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry_after(self, response):
+        """Задержка из заголовка Retry-After (секунды или дата), не больше backoff_max"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0.0), self.backoff_max)
@@ -0,0 +1,334 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import run_batch
+from export_store import export_filename
+from exporters import export_products, get_exporter
+
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def process_alive(pid):
+    """Работает ли другой процесс с идентификатором pid"""
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def product_stats(products):
+    """Статистика по результатам поиска"""
+    return {
+        'total_found': len(products),
+        'detailed_processed': len([p for p in products if 'Описание' in p]),
+        'in_stock': len([p for p in products if p.get('Наличие') == 'В наличии']),
+    }
+
+
+class JobStore:
+    """Хранилище заданий на диске: JSON-файл задания и файл выгрузки
+
+    Файлы заданий, которые не менялись дольше max_age секунд, удаляются
+    фоновым потоком раз в interval секунд; выполняющиеся задания не удаляются.
+    """
+
+    def __init__(self, directory='jobs', max_age=24 * 60 * 60, interval=5 * 60):
+        self.directory = directory
+        self.max_age = max_age
+        self.interval = interval
+        os.makedirs(directory, exist_ok=True)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск фоновой очистки"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._evict_periodically, name='job-eviction', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _evict_periodically(self):
+        while True:
+            try:
+                self.evict()
+            except OSError as e:
+                print(f"Ошибка очистки заданий: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def path(self, job_id, suffix='.json'):
+        if not JOB_ID_RE.match(job_id):
+            raise ValueError(f"Некорректный идентификатор задания: {job_id}")
+        return os.path.join(self.directory, job_id + suffix)
+
+    def save(self, job):
+        path = self.path(job['id'])
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, job_id):
+        try:
+            with open(self.path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def all_ids(self):
+        return [name[:-5] for name in os.listdir(self.directory)
+                if name.endswith('.json') and JOB_ID_RE.match(name[:-5])]
+
+    def evict(self, now=None):
+        """Удаление файлов заданий старше max_age; возвращает число удаленных заданий"""
+        now = now or time.time()
+        files = {}
+        for entry in os.scandir(self.directory):
+            job_id = entry.name.split('.', 1)[0]
+            if entry.is_file() and JOB_ID_RE.match(job_id):
+                files.setdefault(job_id, []).append(entry)
+
+        removed = 0
+        for job_id, entries in files.items():
+            # Задание, его выгрузки и временные файлы удаляются вместе по самому свежему из них
+            if now - max(entry.stat().st_mtime for entry in entries) <= self.max_age:
+                continue
+            job = self.load(job_id)
+            if job and job['status'] in ('queued', 'running'):
+                continue
+            for entry in entries:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+
+        if removed:
+            print(f"Удалено устаревших заданий: {removed}")
+        return removed
+
+
+class JobManager:
+    """Фоновые задания поиска и выгрузки с сохранением прогресса на диск
+
+    Если передан exports (ExportStore), результаты поиска по одному запросу
+    выгружаются через него: одинаковые результаты разных заданий используют
+    один файл, а файл создается при первом скачивании.
+    """
+
+    def __init__(self, parser, store=None, max_workers=2, index=None, exports=None):
+        self.parser = parser
+        self.index = index
+        self.exports = exports
+        self.store = store if store is not None else JobStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        # Задания, поставленные в очередь этим процессом и еще не завершенные
+        self._pending = {}
+        self._mark_interrupted()
+
+    def submit(self, query):
+        """Постановка задания поиска в очередь; возвращает идентификатор задания"""
+        return self._submit({'kind': 'search', 'query': query})
+
+    def submit_batch(self, queries):
+        """Постановка пакетного задания по списку запросов"""
+        return self._submit({'kind': 'batch', 'query': ', '.join(queries), 'queries': list(queries)})
+
+    def _submit(self, fields):
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            # Процесс, выполняющий задание (у gunicorn - воркер)
+            'pid': os.getpid(),
+            'created_at': now,
+            'updated_at': now,
+            'progress': {
+                'pages_fetched': 0,
+                'products_parsed': 0,
+                'details_total': 0,
+                'details_done': 0,
+                'export_written': False,
+            },
+            'error': None,
+            'download_name': None,
+            'export_key': None,
+            'stats': None,
+            'products': None,
+        }
+        job.update(fields)
+        self.store.save(job)
+        future = self._executor.submit(self._run, job)
+        with self._lock:
+            self._pending[future] = job
+        future.add_done_callback(self._forget)
+        return job['id']
+
+    def _forget(self, future):
+        with self._lock:
+            self._pending.pop(future, None)
+
+    def get(self, job_id):
+        """Текущее состояние задания или None
+
+        Незавершенное задание завершившегося процесса (например, воркера
+        gunicorn, остановленного посреди задания) помечается как неудачное.
+        """
+        try:
+            job = self.store.load(job_id)
+        except ValueError:
+            return None
+        if job and job['status'] in ('queued', 'running') and job.get('pid') != os.getpid() \
+                and not process_alive(job.get('pid')):
+            job['status'] = 'failed'
+            job['error'] = 'Задание прервано остановкой сервера'
+            self.store.save(job)
+        return job
+
+    def export_path(self, job_id, fmt='xlsx'):
+        return self.store.path(job_id, '.' + get_exporter(fmt).extension)
+
+    def export(self, job, fmt):
+        """Путь к выгрузке задания в формате fmt; файл создается из результатов задания при первом запросе"""
+        key = job.get('export_key')
+        if key and self.exports is not None:
+            if self.exports.results(key) is None:
+                # Сохраненные результаты вытеснены - восстанавливаем их из задания
+                key = self.exports.put(job['products'] or [], job['query'])
+            return self.exports.path(key, fmt)
+
+        path = self.export_path(job['id'], fmt)
+        if not os.path.exists(path):
+            export_products(job['products'] or [], path, fmt)
+        return path
+
+    def shutdown(self, wait=False):
+        """Остановка: задания из очереди отменяются и помечаются как неудачные
+
+        С wait=True выполняющиеся задания дорабатывают до конца, поэтому
+        закрывать парсер и индекс товаров можно только после возврата.
+        """
+        with self._lock:
+            pending = list(self._pending.items())
+        cancelled = [job for future, job in pending if future.cancel()]
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        for job in cancelled:
+            self._update(job, status='failed', error='Задание отменено остановкой сервера')
+        self.store.close()
+
+    def _update(self, job, **changes):
+        with self._lock:
+            progress = changes.pop('progress', None)
+            if progress:
+                job['progress'].update(progress)
+            job.update(changes)
+            job['updated_at'] = time.time()
+            self.store.save(job)
+
+    def _on_page(self, job):
+        with self._lock:
+            job['progress']['pages_fetched'] += 1
+        self._update(job)
+
+    def _on_detail(self, job):
+        """Загружена страница товара"""
+        with self._lock:
+            job['progress']['pages_fetched'] += 1
+            job['progress']['details_done'] += 1
+        self._update(job)
+
+    def _run(self, job):
+        query = job['query']
+        try:
+            self._update(job, status='running')
+            print(f"Задание {job['id']}: поиск '{query}'")
+
+            if job['kind'] == 'batch':
+                products, success = self._run_batch(job)
+            else:
+                products, success = self._run_search(job)
+
+            self._update(job,
+                         status='done',
+                         progress={'export_written': success},
+                         download_name=export_filename(query[:50]) if success else None,
+                         stats=product_stats(products),
+                         products=[product.to_dict() for product in products])
+            print(f"Задание {job['id']} выполнено: товаров {len(products)}")
+
+        except Exception as e:
+            print(f"Ошибка выполнения задания {job['id']}: {e}")
+            self._update(job, status='failed', error=str(e))
+
+    def _run_search(self, job):
+        products = self.parser.search_products(job['query'])
+
+        # Страницы загружаются только для новых и изменившихся товаров
+        stale = self.index.merge_listing(products) if self.index is not None else products
+        self._update(job, progress={
+            'pages_fetched': 1,
+            'products_parsed': len(products),
+            'details_total': len([p for p in stale if p.get('Ссылка')]),
+        })
+
+        self.parser.enrich_products(stale, on_result=lambda product: self._on_detail(job))
+        if self.index is not None:
+            self.index.save_details(stale)
+        if self.exports is None:
+            return products, self.parser.save_to_excel(products, self.export_path(job['id']))
+
+        if not products:
+            return products, False
+        self._update(job, export_key=self.exports.put(products, job['query']))
+        return products, True
+
+    def _run_batch(self, job):
+        def on_search(query, products):
+            with self._lock:
+                job['progress']['products_parsed'] += len(products)
+            self._on_page(job)
+
+        def on_details(count):
+            self._update(job, progress={'details_total': count})
+
+        results, detailed_count = run_batch(self.parser, job['queries'], on_search=on_search, on_details=on_details,
+                                            on_result=lambda product: self._on_detail(job), index=self.index)
+        success = self.parser.save_batch_to_excel(results, self.export_path(job['id']))
+
+        # Для страницы результатов - уникальные товары всех запросов
+        unique = {}
+        for products in results.values():
+            for product in products:
+                unique.setdefault(product.url or id(product), product)
+        self._update(job, progress={'details_total': detailed_count},
+                     counts={query: len(products) for query, products in results.items()})
+        return list(unique.values()), success
+
+    def _mark_interrupted(self):
+        """Задания, прерванные остановкой процесса, помечаются как неудачные
+
+        Задания других работающих процессов (воркеров gunicorn) не трогаются.
+        """
+        for job_id in self.store.all_ids():
+            job = self.store.load(job_id)
+            if job and job['status'] in ('queued', 'running') and not process_alive(job.get('pid')):
+                job['status'] = 'failed'
+                job['error'] = 'Задание прервано перезапуском сервера'
+                self.store.save(job)
@@ -0,0 +1,231 @@
+"""Метрики производительности в формате Prometheus и профилирование запросов
+
+Этапы обработки (загрузка, декодирование, разбор HTML, поиск карточек,
+извлечение полей, выгрузка) замеряются через span() и timed() и попадают
+в гистограмму jazz_shop_stage_seconds. REGISTRY.render() возвращает все
+метрики в текстовом формате Prometheus для маршрута /metrics.
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Границы корзин гистограмм, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонно растущий счетчик с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name + _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Гистограмма длительностей с накопительными корзинами"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Счетчики корзин, сумма и число наблюдений
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, **labels):
+        """Число наблюдений и сумма для набора меток"""
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return (series[2], series[1]) if series else (0, 0.0)
+
+    def series(self, **labels):
+        """Копия счетчиков корзин, сумма и число наблюдений для набора меток"""
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return (list(series[0]), series[1], series[2]) if series else ([0] * len(self.buckets), 0.0, 0)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield self.name + '_bucket' + _format_labels(self.labelnames, key, [('le', repr(bound))]), cumulative
+            yield self.name + '_bucket' + _format_labels(self.labelnames, key, [('le', '+Inf')]), count
+            yield self.name + '_sum' + _format_labels(self.labelnames, key), total
+            yield self.name + '_count' + _format_labels(self.labelnames, key), count
+
+
+class Registry:
+    """Набор метрик приложения"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram('jazz_shop_stage_seconds', 'Длительность этапов обработки', ('stage',))
+STAGE_ERRORS = REGISTRY.counter('jazz_shop_stage_errors_total', 'Этапы, завершившиеся исключением', ('stage',))
+UPSTREAM_RESPONSES = REGISTRY.counter('jazz_shop_upstream_responses_total', 'Ответы сайта по кодам', ('status',))
+UPSTREAM_RETRIES = REGISTRY.counter('jazz_shop_upstream_retries_total', 'Повторы запросов к сайту', ('reason',))
+CIRCUIT_REJECTIONS = REGISTRY.counter('jazz_shop_circuit_rejections_total',
+                                      'Запросы, отклоненные разомкнутой цепью', ('host',))
+PRODUCTS_PARSED = REGISTRY.counter('jazz_shop_products_parsed_total', 'Разобранные карточки товаров')
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('jazz_shop_http_request_seconds', 'Длительность обработки запросов к приложению',
+                                          ('endpoint', 'method'))
+HTTP_RESPONSES = REGISTRY.counter('jazz_shop_http_responses_total', 'Ответы приложения', ('endpoint', 'status'))
+
+
+@contextmanager
+def span(stage):
+    """Замер длительности этапа; исключения учитываются в jazz_shop_stage_errors_total"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def timed(stage):
+    """Декоратор: каждый вызов функции замеряется как этап stage"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                STAGE_ERRORS.inc(stage=stage)
+                raise
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        return wrapper
+    return decorator
+
+
+class RequestProfiler:
+    """Профилирование одного запроса: pyinstrument, если установлен, иначе cProfile
+
+    Профилируется только поток, обрабатывающий запрос; работа в пулах потоков
+    (загрузка страниц товаров) видна как ожидание.
+    """
+
+    def __init__(self, sort='cumulative', limit=60):
+        self.sort = sort
+        self.limit = limit
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self.backend = 'pyinstrument'
+        except ImportError:
+            self._profiler = cProfile.Profile()
+            self.backend = 'cProfile'
+
+    def start(self):
+        if self.backend == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        """Остановка профилировщика; возвращает текстовый отчет"""
+        if self.backend == 'pyinstrument':
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True)
+
+        self._profiler.disable()
+        output = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=output)
+        stats.sort_stats(self.sort).print_stats(self.limit)
+        return output.getvalue()
@@ -1,16 +1,88 @@
 import requests
-from bs4 import BeautifulSoup
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-import time
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, Tag
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from site_state import SiteState
+from http_cache import ResponseCache
+from http_policy import CircuitOpenError, RequestPolicy
+from metrics import PRODUCTS_PARSED, span, timed
+from rules import ExtractorRules, LayoutProfile, load_rules
+from product import DETAIL_FAILED, Product
+from exporters import export_products, export_sheets
+import importlib.util
+import threading
 import re
+from itertools import chain
 from urllib.parse import quote, urljoin
-import json
+
+
+# Построители дерева BeautifulSoup; lxml заметно быстрее встроенного html.parser
+PARSER_BACKENDS = ('lxml', 'html.parser')
+DEFAULT_BACKEND = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Ключ выученной разметки карточек в состоянии парсера
+LAYOUT_STATE_KEY = 'layout_profile'
+# Сколько карточек просматривается при выборе селекторов полей
+LAYOUT_SAMPLE = 5
+
+# Кодировки, которые пробуются, если сервер не указал charset
+FALLBACK_ENCODINGS = ('utf-8', 'cp1251')
+CHARSET_RE = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+def unique_by_link(products):
+    """Товары без повторов ссылки; товары без ссылки сохраняются все"""
+    seen = set()
+    result = []
+    for product in products:
+        if product.url:
+            if product.url in seen:
+                continue
+            seen.add(product.url)
+        result.append(product)
+    return result
+
+
+def first_matching_selector(sources, selectors, elements, accept=None):
+    """Первый по порядку селектор, который находит подходящий элемент хотя бы в одной карточке
+
+    Возвращает исходную строку селектора или None.
+    """
+    for source, selector in zip(sources, selectors):
+        for element in elements:
+            found = selector.select_one(element)
+            if found is not None and (accept is None or accept(found)):
+                return source
+    return None
 
 
 class JazzShopParser:
-    def __init__(self):
-        self.base_url = "https://jazz-shop.ru"
+    # Варианты поисковых URL сайта
+    SEARCH_URL_TEMPLATES = [
+        "{base_url}/search/?query={query}",
+        "{base_url}/search/?q={query}",
+        "{base_url}/search?query={query}",
+        "{base_url}/search?q={query}",
+        "{base_url}/catalog/search/?query={query}",
+    ]
+
+    def __init__(self, max_workers=8, requests_per_second=10, timeout=15, state=None, cache=None,
+                 pool_size=None, base_url="https://jazz-shop.ru", backend=None, rules=None,
+                 connect_timeout=5, max_retries=3):
+        backend = backend or DEFAULT_BACKEND
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"Неизвестный парсер HTML: {backend}")
+
+        self.base_url = base_url.rstrip('/')
+        self.backend = backend
+        # Правила извлечения: готовый набор, имя из реестра или путь к JSON-файлу
+        self.rules = rules if isinstance(rules, ExtractorRules) else load_rules(rules)
+        self.max_workers = max_workers
+        self.state = state if state is not None else SiteState()
+        # cache=False отключает кэширование ответов
+        self.cache = ResponseCache(rules=self.rules) if cache is None else (cache or None)
+        if self.cache is not None and self.cache.rules is None:
+            self.cache.rules = self.rules
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -21,45 +93,81 @@ class JazzShopParser:
             'Upgrade-Insecure-Requests': '1',
         })
 
+        # Пул соединений рассчитан на параллельную загрузку страниц из нескольких потоков
+        pool_size = pool_size or max(10, max_workers * 2)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # timeout - таймаут чтения ответа; соединение ограничено connect_timeout
+        self.http = RequestPolicy(self.session, requests_per_second, connect_timeout=connect_timeout,
+                                  read_timeout=timeout, max_retries=max_retries)
+
+        # Разметка карточек, выученная на прошлых страницах
+        self.layout = LayoutProfile.from_dict(self.state.get(LAYOUT_STATE_KEY))
+
+    def close(self):
+        """Закрытие соединений и кэша"""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get(self, url):
+        """GET-запрос через кэш ответов"""
+        if self.cache is None:
+            return self._request(url)
+        return self.cache.fetch(url, self._request)
+
+    def _request(self, url, **kwargs):
+        """GET-запрос через политику запросов: ограничение частоты, повторы, размыкатель цепи"""
+        with span('fetch'):
+            return self.http.get(url, **kwargs)
+
+    @timed('decode')
+    def _decode(self, response):
+        """Однократное декодирование тела ответа
+
+        Используется charset из заголовка Content-Type, иначе UTF-8 и CP1251.
+        """
+        content = response.content
+        match = CHARSET_RE.search(response.headers.get('Content-Type') or '')
+        encodings = ((match.group(1),) if match else ()) + FALLBACK_ENCODINGS
+        for encoding in encodings:
+            try:
+                return content.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                continue
+        return content.decode('utf-8', errors='replace')
+
+    def _make_soup(self, response):
+        """Построение дерева страницы выбранным парсером"""
+        html = self._decode(response)
+        with span('parse'):
+            return BeautifulSoup(html, self.backend)
+
     def search_products(self, query):
         """Поиск товаров по запросу"""
-        # Пробуем разные варианты поисковых URL
-        search_urls = [
-            f"{self.base_url}/search/?query={quote(query)}",
-            f"{self.base_url}/search/?q={quote(query)}",
-            f"{self.base_url}/search?query={quote(query)}",
-            f"{self.base_url}/search?q={quote(query)}",
-            f"{self.base_url}/catalog/search/?query={quote(query)}",
-        ]
-
+        encoded_query = quote(query)
         products = []
 
-        for search_url in search_urls:
-            print(f"Пробуем URL: {search_url}")
-            try:
-                response = self.session.get(search_url, timeout=15)
-                response.raise_for_status()
-
-                # Пробуем разные кодировки
-                for encoding in ['utf-8', 'windows-1251', 'cp1251']:
-                    try:
-                        response.encoding = encoding
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        break
-                    except:
-                        continue
-
-                # Ищем товары разными способами
-                products = self._find_products(soup)
-                if products:
-                    print(f"Найдено товаров: {len(products)}")
-                    break
-                else:
-                    print("Товары не найдены, пробуем следующий URL...")
+        # Сначала пробуем шаблон, который вернул товары в прошлый раз
+        template = self.state.get('search_template')
+        if template in self.SEARCH_URL_TEMPLATES:
+            products = self._search_with_template(template, encoded_query)
+            if not products:
+                print("Запомненный поисковый URL не вернул товаров, перебираем варианты...")
 
-            except Exception as e:
-                print(f"Ошибка при запросе {search_url}: {e}")
-                continue
+        if not products:
+            other_templates = [t for t in self.SEARCH_URL_TEMPLATES if t != template]
+            winner, products = self._race_search_templates(other_templates, encoded_query)
+            if winner:
+                self.state.set('search_template', winner)
 
         # Если не нашли через поиск, пробуем парсить главную страницу или категории
         if not products:
@@ -67,103 +175,203 @@ class JazzShopParser:
 
         return products
 
-    def _find_products(self, soup):
-        """Поиск товаров на странице разными методами"""
-        products = []
+    def _search_with_template(self, template, encoded_query, cancelled=None):
+        """Поиск товаров по одному шаблону поискового URL"""
+        search_url = template.format(base_url=self.base_url, query=encoded_query)
+        print(f"Пробуем URL: {search_url}")
+        try:
+            response = self._get(search_url)
+            response.raise_for_status()
 
-        # Метод 1: Ищем по классам
-        class_selectors = [
-            '.product',
-            '.item',
-            '.goods',
-            '.catalog-item',
-            '.product-item',
-            '.item-product',
-            '.card',
-            '.product-card',
-            '.shop-item'
-        ]
-
-        for selector in class_selectors:
-            elements = soup.select(selector)
-            if elements:
-                print(f"Найдено элементов с селектором {selector}: {len(elements)}")
-                for element in elements:
-                    product = self._parse_product_element(element)
-                    if product and product['Название'] != "Название не найдено":
-                        products.append(product)
-                if products:
-                    return products
+            # Другой вариант уже вернул товары, разбирать страницу не нужно
+            if cancelled is not None and cancelled.is_set():
+                return []
 
-        # Метод 2: Ищем по структуре - элементы с ценами
-        price_elements = soup.find_all(text=re.compile(r'руб|р\.|₽|цена', re.IGNORECASE))
-        for price_element in price_elements:
-            parent = price_element.parent
-            product = self._parse_nearby_elements(parent)
-            if product and product['Название'] != "Название не найдено":
-                products.append(product)
+            soup = self._make_soup(response)
 
-        # Метод 3: Ищем все карточки товаров
-        cards = soup.find_all(['div', 'article', 'li'], class_=True)
-        for card in cards:
-            card_classes = card.get('class', [])
-            if any(cls for cls in card_classes if
-                   any(word in cls.lower() for word in ['product', 'item', 'card', 'goods', 'shop'])):
-                product = self._parse_product_element(card)
-                if product and product['Название'] != "Название не найдено":
-                    products.append(product)
-
-        return products[:20]  # Ограничиваем количество
-
-    def _parse_product_element(self, element):
-        """Парсинг элемента товара"""
-        try:
-            product = {}
+            # Ищем товары разными способами
+            products = self._find_products(soup)
+            if products:
+                print(f"Найдено товаров: {len(products)}")
+            else:
+                print(f"Товары не найдены по URL: {search_url}")
+            return products
 
-            # Название
-            name = self._extract_name(element)
-            product['Название'] = name if name else "Название не найдено"
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"Ошибка при запросе {search_url}: {e}")
+            return []
 
-            # Цена
-            price = self._extract_price_from_element(element)
-            product['Цена'] = price if price else "Цена не найдена"
+    def _race_search_templates(self, templates, encoded_query):
+        """Одновременный запрос всех вариантов поискового URL
 
-            # Ссылка
-            link = self._extract_link(element)
-            product['Ссылка'] = link if link else ""
+        Возвращает первый шаблон, вернувший товары, и найденные товары.
+        Остальные запросы отменяются. Если сайт недоступен (цепь разомкнута),
+        выбрасывается CircuitOpenError.
+        """
+        if not templates:
+            return None, []
 
-            # Бренд
-            brand = self._extract_brand(element)
-            product['Бренд'] = brand if brand else "Бренд не указан"
+        cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(templates))
+        try:
+            futures = {
+                executor.submit(self._search_with_template, template, encoded_query, cancelled): template
+                for template in templates
+            }
+            circuit_error = None
+            for future in as_completed(futures):
+                try:
+                    products = future.result()
+                except CircuitOpenError as e:
+                    circuit_error = e
+                    continue
+                if products:
+                    cancelled.set()
+                    return futures[future], products
+            if circuit_error is not None:
+                raise circuit_error
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return None, []
+
+    @timed('find_products')
+    def _find_products(self, soup, limit=20):
+        """Поиск товаров на странице
+
+        Если разметка карточек уже выучена, карточки выбираются одним целевым
+        селектором. Иначе (или если профиль перестал находить товары) карточки
+        ищутся всеми методами, и разметка, найденная по классу карточки,
+        запоминается для следующих страниц. Товары с одинаковой ссылкой
+        попадают в результат один раз.
+        limit ограничивает результат резервных методов (None - без ограничения).
+        """
+        layout = self.layout
+        if layout is not None:
+            products = self._find_with_layout(soup, layout)
+            if products:
+                return products
+            print("Запомненная разметка карточек не подошла, ищем карточки заново...")
+
+        return self._discover_products(soup, limit)
+
+    def _find_with_layout(self, soup, layout):
+        """Быстрый путь: карточки по выученному селектору, поля по выученным селекторам"""
+        elements = layout.card.select(soup)
+        products = (self._parse_product_element(element, layout) for element in elements)
+        return unique_by_link(product for product in products if product and product.name)
+
+    def _discover_products(self, soup, limit):
+        """Поиск товаров разными методами
+
+        Дерево обходится один раз: за этот проход собираются кандидаты для всех
+        методов, а каждый элемент разбирается не более одного раза.
+        """
+        by_class, price_parents, cards = self._scan_tree(soup)
+
+        parsed = {}
+
+        def parse(element):
+            key = id(element)
+            if key not in parsed:
+                parsed[key] = self._parse_product_element(element)
+            product = parsed[key]
+            return product.copy() if product else None
 
-            # Наличие
-            availability = self._extract_availability(element)
-            product['Наличие'] = availability
+        # Метод 1: Ищем по классам
+        for card_class in self.rules.card_classes:
+            elements = by_class.get(card_class)
+            if elements:
+                print(f"Найдено элементов с селектором .{card_class}: {len(elements)}")
+                products = unique_by_link(product for product in map(parse, elements) if product and product.name)
+                if products:
+                    self._learn_layout(card_class, elements)
+                    return products
 
-            # Артикул
-            article = self._extract_article(element)
-            product['Артикул'] = article
+        # Метод 2: Ищем по структуре - элементы с ценами
+        # Метод 3: Ищем все карточки товаров
+        # Оба метода часто находят одну и ту же карточку, поэтому дубли отбрасываются по ссылке
+        products = unique_by_link(product for product in map(parse, price_parents + cards)
+                                  if product and product.name)
+
+        return products[:limit]  # Ограничиваем количество
+
+    def _learn_layout(self, card_class, elements):
+        """Запоминание разметки карточек, найденных по классу card_class"""
+        tags = {element.name for element in elements}
+        card = f"{tags.pop()}.{card_class}" if len(tags) == 1 else f".{card_class}"
+        sample = elements[:LAYOUT_SAMPLE]
+        rules = self.rules
+
+        name = first_matching_selector(rules.source['name_selectors'], rules.name_selectors, sample,
+                                       lambda elem: len(elem.get_text(strip=True)) > 3)
+        brand = first_matching_selector(rules.source['brand_selectors'], rules.brand_selectors, sample)
+
+        layout = LayoutProfile(card, name, brand)
+        if self.layout is None or self.layout.source != layout.source:
+            print(f"Запомнена разметка карточек: {card}")
+            self.layout = layout
+            self.state.set(LAYOUT_STATE_KEY, layout.to_dict())
+
+    def _scan_tree(self, soup):
+        """Один обход дерева с классификацией кандидатов в карточки товаров
+
+        Возвращает элементы по классам карточек (Метод 1), родителей текстов
+        с ценой (Метод 2) и элементы с «товарными» классами (Метод 3).
+        """
+        rules = self.rules
+        by_class = {}
+        price_parents = []
+        cards = []
+
+        for node in soup.descendants:
+            if isinstance(node, Tag):
+                classes = node.get('class')
+                if not classes:
+                    continue
+                for card_class in rules.card_class_set.intersection(classes):
+                    by_class.setdefault(card_class, []).append(node)
+                if node.name in rules.card_tags and rules.card_class_words.search(' '.join(classes).lower()):
+                    cards.append(node)
+            elif rules.price_text.search(node):
+                price_parents.append(node.parent)
 
-            return product
+        return by_class, price_parents, cards
+
+    def _parse_product_element(self, element, layout=None):
+        """Парсинг элемента товара; layout - выученные селекторы полей"""
+        try:
+            # Текст элемента вычисляется один раз для всех извлекателей
+            text = element.get_text()
+            PRODUCTS_PARSED.inc()
+
+            return Product(
+                name=self._extract_name(element, layout.name if layout else None),
+                price=self._extract_price_from_element(element, text),
+                url=self._extract_link(element),
+                brand=self._extract_brand(element, layout.brand if layout else None),
+                availability=self._extract_availability(element, text),
+                article=self._extract_article(element, text),
+            )
 
         except Exception as e:
             print(f"Ошибка парсинга элемента: {e}")
             return None
 
-    def _extract_name(self, element):
-        """Извлечение названия товара"""
-        name_selectors = [
-            '.name',
-            '.title',
-            '.product-name',
-            '.item-name',
-            'h1', 'h2', 'h3', 'h4',
-            'a[class*="name"]',
-            'a[class*="title"]'
-        ]
-
-        for selector in name_selectors:
-            name_elem = element.select_one(selector)
+    @timed('extract_name')
+    def _extract_name(self, element, learned=None):
+        """Извлечение названия товара; learned - выученный селектор, проверяется первым"""
+        if learned is not None:
+            name_elem = learned.select_one(element)
+            if name_elem:
+                text = name_elem.get_text(strip=True)
+                if text and len(text) > 3:
+                    return text
+
+        for selector in self.rules.name_selectors:
+            name_elem = selector.select_one(element)
             if name_elem:
                 text = name_elem.get_text(strip=True)
                 if text and len(text) > 3:
@@ -173,40 +381,38 @@ class JazzShopParser:
         links = element.find_all('a', href=True)
         for link in links:
             text = link.get_text(strip=True)
-            if text and len(text) > 3 and not re.match(r'^(купить|в корзину|подробнее)$', text, re.IGNORECASE):
+            if text and len(text) > 3 and not self.rules.name_skip.match(text):
                 return text
 
         return None
 
-    def _extract_price_from_element(self, element):
+    @timed('extract_price')
+    def _extract_price_from_element(self, element, text=None):
         """Извлечение цены из элемента"""
         # Ищем цену в тексте элемента и его детей
-        text = element.get_text()
-        price_patterns = [
-            r'(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)\s*руб',
-            r'(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)\s*р\.',
-            r'цена[:\s]*(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)',
-            r'₽\s*(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)'
-        ]
-
-        for pattern in price_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                price_clean = matches[0].replace(' ', '').replace(',', '.')
+        if text is None:
+            text = element.get_text()
+
+        for pattern in self.rules.price_patterns:
+            match = pattern.search(text)
+            if match:
+                price_clean = match.group(1).replace(' ', '').replace(',', '.')
                 try:
-                    return f"{float(price_clean):.2f}"
+                    return float(price_clean)
                 except:
                     continue
 
         return None
 
+    @timed('extract_link')
     def _extract_link(self, element):
         """Извлечение ссылки на товар"""
-        # Ищем ссылки в элементе
-        links = element.find_all('a', href=True)
-        for link in links:
-            href = link.get('href')
-            if href and not any(x in href.lower() for x in ['javascript:', '#', 'mailto:', 'tel:']):
+        # Ищем ссылки в элементе; обход останавливается на первой подходящей
+        for node in element.descendants:
+            if not isinstance(node, Tag) or node.name != 'a':
+                continue
+            href = node.get('href')
+            if href and not any(x in href.lower() for x in self.rules.link_skip):
                 if href.startswith('/'):
                     return urljoin(self.base_url, href)
                 elif href.startswith('http'):
@@ -215,62 +421,45 @@ class JazzShopParser:
                     return urljoin(self.base_url, '/' + href.lstrip('/'))
         return None
 
-    def _extract_brand(self, element):
-        """Извлечение бренда"""
-        brand_selectors = [
-            '.brand',
-            '.vendor',
-            '.producer',
-            '.manufacturer'
-        ]
-
-        for selector in brand_selectors:
-            brand_elem = element.select_one(selector)
+    @timed('extract_brand')
+    def _extract_brand(self, element, learned=None):
+        """Извлечение бренда; learned - выученный селектор, проверяется первым"""
+        if learned is not None:
+            brand_elem = learned.select_one(element)
+            if brand_elem:
+                return brand_elem.get_text(strip=True)
+
+        for selector in self.rules.brand_selectors:
+            brand_elem = selector.select_one(element)
             if brand_elem:
                 return brand_elem.get_text(strip=True)
 
         return None
 
-    def _extract_availability(self, element):
+    @timed('extract_availability')
+    def _extract_availability(self, element, text=None):
         """Извлечение информации о наличии"""
-        text = element.get_text().lower()
-        if any(word in text for word in ['в наличии', 'есть', 'доступен', 'available', 'купить']):
+        if text is None:
+            text = element.get_text()
+        text = text.lower()
+        if self.rules.in_stock_words.search(text):
             return "В наличии"
-        elif any(word in text for word in ['нет в наличии', 'распродан', 'ожидается', 'под заказ']):
+        elif self.rules.out_of_stock_words.search(text):
             return "Нет в наличии"
         else:
-            return "Неизвестно"
+            return None
 
-    def _extract_article(self, element):
+    @timed('extract_article')
+    def _extract_article(self, element, text=None):
         """Извлечение артикула"""
-        text = element.get_text()
-        patterns = [
-            r'арт[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
-            r'art[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
-            r'код[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
-            r'code[.\s]*[:#]?\s*([a-zA-Z0-9-]+)'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        if text is None:
+            text = element.get_text()
+
+        for pattern in self.rules.article_patterns:
+            match = pattern.search(text)
             if match:
                 return match.group(1)
 
-        return "Артикул не найден"
-
-    def _parse_nearby_elements(self, element):
-        """Парсинг соседних элементов вокруг цены"""
-        # Ищем название в родительских элементах
-        for i in range(3):
-            parent = element
-            for j in range(i):
-                parent = getattr(parent, 'parent', None)
-                if not parent:
-                    break
-
-            if parent:
-                return self._parse_product_element(parent)
-
         return None
 
     def _fallback_search(self, query):
@@ -279,8 +468,8 @@ class JazzShopParser:
 
         # Пробуем получить главную страницу и найти категории
         try:
-            response = self.session.get(self.base_url, timeout=15)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            response = self._get(self.base_url)
+            soup = self._make_soup(response)
 
             # Ищем ссылки, содержащие запрос
             query_words = query.lower().split()
@@ -290,30 +479,28 @@ class JazzShopParser:
             for link in links:
                 link_text = link.get_text().lower()
                 if any(word in link_text for word in query_words):
-                    product = {
-                        'Название': link.get_text(strip=True),
-                        'Цена': "Неизвестно",
-                        'Ссылка': urljoin(self.base_url, link['href']),
-                        'Бренд': "Не указан",
-                        'Наличие': "Неизвестно",
-                        'Артикул': "Не найден"
-                    }
-                    products.append(product)
+                    products.append(Product(name=link.get_text(strip=True),
+                                            url=urljoin(self.base_url, link['href'])))
 
             return products[:10]
 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Ошибка в резервном поиске: {e}")
             return []
 
+    @timed('detail_fetch')
     def get_detailed_info(self, product_url):
         """Получение детальной информации о товаре"""
         if not product_url:
             return {}
 
         try:
-            response = self.session.get(product_url, timeout=15)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            response = self._get(product_url)
+            # Страница ошибки после исчерпания повторов - не страница товара
+            response.raise_for_status()
+            soup = self._make_soup(response)
 
             detailed_info = {}
 
@@ -322,37 +509,52 @@ class JazzShopParser:
             detailed_info['Описание'] = description
 
             # Характеристики
-            characteristics = self._extract_characteristics(soup)
-            detailed_info['Характеристики'] = json.dumps(characteristics, ensure_ascii=False)
+            detailed_info['Характеристики'] = self._extract_characteristics(soup)
 
             return detailed_info
 
         except Exception as e:
             print(f"Ошибка получения детальной информации: {e}")
             return {
-                'Описание': 'Не удалось получить описание',
-                'Характеристики': '{}'
+                'Описание': DETAIL_FAILED,
+                'Характеристики': {}
             }
 
+    def enrich_products(self, products, max_workers=None, on_result=None):
+        """Параллельное получение детальной информации для списка товаров
+
+        Страницы товаров загружаются пулом потоков, товары дополняются на месте,
+        поэтому их порядок сохраняется. on_result(product) вызывается по мере
+        готовности каждого товара. Возвращает количество обработанных товаров.
+        """
+        targets = [product for product in products if product.get('Ссылка')]
+        if not targets:
+            return 0
+
+        workers = max(1, min(max_workers or self.max_workers, len(targets)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.get_detailed_info, p['Ссылка']): p for p in targets}
+            for future in as_completed(futures):
+                product = futures[future]
+                product.update(future.result())
+                if on_result:
+                    on_result(product)
+
+        return len(targets)
+
+    @timed('extract_description')
     def _extract_description(self, soup):
         """Извлечение описания товара"""
-        desc_selectors = [
-            '.description',
-            '.product-description',
-            '.item-description',
-            '[class*="desc"]',
-            '#description'
-        ]
-
-        for selector in desc_selectors:
-            elem = soup.select_one(selector)
+        for selector in self.rules.description_selectors:
+            elem = selector.select_one(soup)
             if elem:
                 text = elem.get_text(strip=True)
                 if text and len(text) > 10:
                     return text[:500] + "..." if len(text) > 500 else text
 
-        return "Описание не найдено"
+        return None
 
+    @timed('extract_characteristics')
     def _extract_characteristics(self, soup):
         """Извлечение характеристик товара"""
         specs = {}
@@ -381,53 +583,38 @@ class JazzShopParser:
 
         return specs
 
+    @timed('save_to_excel')
     def save_to_excel(self, products, filename='jazz_shop_products.xlsx'):
-        """Сохранение результатов в Excel"""
-        if not products:
+        """Потоковое сохранение результатов в Excel через exporters
+
+        products может быть любым итерируемым объектом, в том числе генератором.
+        Строки пишутся в книгу в режиме write-only, поэтому память не растет
+        с числом товаров; файл заменяется только после успешной записи.
+        """
+        products = iter(products)
+        first = next(products, None)
+        if first is None:
+            print("Нет данных для сохранения")
+            return False
+
+        return self._save_workbook(filename, lambda: export_products(chain([first], products), filename, 'xlsx'))
+
+    @timed('save_to_excel')
+    def save_batch_to_excel(self, results, filename):
+        """Сохранение результатов нескольких запросов: отдельный лист на каждый запрос"""
+        if not results:
             print("Нет данных для сохранения")
             return False
 
+        return self._save_workbook(filename, lambda: export_sheets(results, filename))
+
+    def _save_workbook(self, filename, write):
+        """Запись книги функцией write() -> число строк; ошибки выводятся, а не выбрасываются"""
         try:
-            wb = Workbook()
-            ws_products = wb.active
-            ws_products.title = "Товары"
-
-            # Заголовки
-            headers = ['Название', 'Бренд', 'Цена', 'Наличие', 'Артикул', 'Ссылка', 'Описание', 'Характеристики']
-            for col, header in enumerate(headers, 1):
-                cell = ws_products.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-
-            # Данные
-            for row, product in enumerate(products, 2):
-                ws_products.cell(row=row, column=1, value=product.get('Название', ''))
-                ws_products.cell(row=row, column=2, value=product.get('Бренд', ''))
-                ws_products.cell(row=row, column=3, value=product.get('Цена', ''))
-                ws_products.cell(row=row, column=4, value=product.get('Наличие', ''))
-                ws_products.cell(row=row, column=5, value=product.get('Артикул', ''))
-                ws_products.cell(row=row, column=6, value=product.get('Ссылка', ''))
-                ws_products.cell(row=row, column=7, value=product.get('Описание', ''))
-                ws_products.cell(row=row, column=8, value=product.get('Характеристики', ''))
-
-            # Авто-ширина колонок
-            for column in ws_products.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws_products.column_dimensions[column_letter].width = adjusted_width
-
-            # Сохраняем файл
-            wb.save(filename)
-            print(f"Файл сохранен: {filename}")
+            count = write()
+            print(f"Файл сохранен: {filename} (строк: {count})")
             return True
 
         except Exception as e:
             print(f"Ошибка сохранения в Excel: {e}")
-            return False
\ No newline at end of file
+            return False
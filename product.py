@@ -0,0 +1,163 @@
+"""Товар с типизированными полями
+
+Отсутствующие значения хранятся как None, цена - числом, характеристики -
+словарем. Для шаблонов, JSON API и выгрузок товар по-прежнему доступен как
+словарь с русскими ключами: product['Цена'], product.get('Описание'),
+'Описание' in product, product.update(...) и to_dict() возвращают прежние
+значения-заглушки и характеристики в виде строки JSON.
+"""
+import json
+from dataclasses import dataclass, replace
+from urllib.parse import urldefrag
+
+# Поля товара: ключ словаря, атрибут, тип значения и заглушка для отсутствующего значения
+PRODUCT_SCHEMA = (
+    ('Название', 'name', 'string', "Название не найдено"),
+    ('Бренд', 'brand', 'string', "Бренд не указан"),
+    ('Цена', 'price', 'float', "Цена не найдена"),
+    ('Наличие', 'availability', 'string', "Неизвестно"),
+    ('Артикул', 'article', 'string', "Артикул не найден"),
+    ('Ссылка', 'url', 'string', ""),
+    ('Описание', 'description', 'string', "Описание не найдено"),
+    ('Характеристики', 'characteristics', 'map', "{}"),
+)
+FIELDS = {key: (attr, kind, placeholder) for key, attr, kind, placeholder in PRODUCT_SCHEMA}
+# Поля со страницы товара; в словаре появляются после загрузки страницы
+DETAIL_KEYS = ('Описание', 'Характеристики')
+DETAIL_FAILED = 'Не удалось получить описание'
+
+# Заглушки прежних версий и резервного поиска, которые тоже означают отсутствие значения
+MISSING_VALUES = {
+    'Цена': {"Цена не найдена", "Неизвестно"},
+    'Бренд': {"Бренд не указан", "Не указан"},
+    'Артикул': {"Артикул не найден", "Не найден"},
+    'Наличие': {"Неизвестно"},
+    'Название': {"Название не найдено"},
+    'Описание': {"Описание не найдено"},
+}
+
+
+def parse_price(value):
+    """Числовая цена из строки или None"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).replace(' ', '').replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def parse_characteristics(value):
+    """Словарь характеристик из словаря или строки JSON"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value or '{}')
+        except ValueError:
+            return {}
+    return dict(value) if value else {}
+
+
+@dataclass(slots=True)
+class Product:
+    name: str | None = None
+    brand: str | None = None
+    price: float | None = None
+    availability: str | None = None
+    article: str | None = None
+    url: str | None = None
+    description: str | None = None
+    characteristics: dict | None = None
+    # Страница товара загружена (успешно или нет)
+    detailed: bool = False
+    detail_failed: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        """Товар из словаря с русскими ключами; неизвестные ключи пропускаются"""
+        if isinstance(data, cls):
+            return data.copy()
+        product = cls()
+        product.update(data)
+        return product
+
+    def to_dict(self):
+        """Словарь с русскими ключами и прежними значениями-заглушками"""
+        return {key: self[key] for key in self.keys()}
+
+    def copy(self):
+        return replace(self, characteristics=dict(self.characteristics) if self.characteristics else None)
+
+    def keys(self):
+        if self.detailed:
+            return list(FIELDS)
+        return [key for key in FIELDS if key not in DETAIL_KEYS]
+
+    def __contains__(self, key):
+        return key in FIELDS and (self.detailed or key not in DETAIL_KEYS)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        attr, kind, placeholder = FIELDS[key]
+        if key == 'Описание' and self.detail_failed:
+            return DETAIL_FAILED
+        value = getattr(self, attr)
+        if kind == 'map':
+            return json.dumps(value or {}, ensure_ascii=False)
+        if value is None:
+            return placeholder
+        if kind == 'float':
+            return f"{value:.2f}"
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        field = FIELDS.get(key)
+        if field is None:
+            raise KeyError(key)
+        attr, kind, _ = field
+
+        if key in DETAIL_KEYS:
+            self.detailed = True
+            if key == 'Описание':
+                self.detail_failed = value == DETAIL_FAILED
+                if self.detail_failed:
+                    value = None
+        if kind == 'float':
+            value = parse_price(value)
+        elif kind == 'map':
+            value = parse_characteristics(value)
+        elif value == '' or value in MISSING_VALUES.get(key, ()):
+            value = None
+        setattr(self, attr, value)
+
+    def update(self, data):
+        for key, value in data.items():
+            if key in FIELDS:
+                self[key] = value
+
+
+def product_key(product):
+    """Ключ товара для устранения дублей между запросами: ссылка, а без нее - артикул
+
+    Артикул извлекается из текста карточки эвристикой и у разных товаров
+    бывает одинаковым (шаблон «art» находит «in» в «Martin»), поэтому
+    ссылка на страницу товара надежнее.
+    """
+    if isinstance(product, Product):
+        link, article = product.url, product.article
+    else:
+        link, article = product.get('Ссылка'), product.get('Артикул')
+        if article in MISSING_VALUES['Артикул']:
+            article = None
+
+    if link:
+        return 'link:' + urldefrag(link)[0]
+    if article:
+        return 'article:' + article
+    return None
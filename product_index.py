@@ -0,0 +1,233 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from product import DETAIL_FAILED, product_key
+
+# Версия изменения строки: следующий номер после наибольшего в таблице. Выражение
+# вычисляется внутри пишущей транзакции, а SQLite не допускает двух пишущих
+# транзакций одновременно, поэтому версии растут в порядке фиксации и у записей
+# других процессов
+NEXT_VERSION = "(SELECT COALESCE(MAX(version), 0) + 1 FROM products)"
+
+# Поля карточки товара из результатов поиска
+LISTING_FIELDS = ('Название', 'Цена', 'Ссылка', 'Бренд', 'Наличие', 'Артикул')
+
+COLUMNS = {
+    'Название': 'name',
+    'Цена': 'price',
+    'Ссылка': 'link',
+    'Бренд': 'brand',
+    'Наличие': 'availability',
+    'Артикул': 'article',
+    'Описание': 'description',
+    'Характеристики': 'characteristics',
+}
+
+
+def listing_hash(product):
+    """Хэш полей карточки; изменение означает, что страницу товара нужно загрузить заново"""
+    data = '\x1f'.join(str(product.get(field, '')) for field in LISTING_FIELDS)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class ProductIndex:
+    """Локальное хранилище товаров (SQLite) с историей цен и наличия
+
+    Строки хранятся по ключу product_key: ссылка на страницу товара, а для
+    карточек без ссылки - артикул.
+    """
+
+    def __init__(self, path='jazz_shop_products.sqlite'):
+        self.path = path
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                key TEXT PRIMARY KEY,
+                name TEXT,
+                price TEXT,
+                link TEXT,
+                brand TEXT,
+                availability TEXT,
+                article TEXT,
+                description TEXT,
+                characteristics TEXT,
+                listing_hash TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                detailed_at REAL,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS price_history (
+                key TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                price TEXT,
+                availability TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_price_history_key ON price_history (key, seen_at);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(products)")}
+        if 'version' not in columns:
+            self._conn.execute("ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._conn.executescript("""
+            DROP INDEX IF EXISTS idx_products_last_seen;
+            DROP INDEX IF EXISTS idx_products_detailed_at;
+            CREATE INDEX IF NOT EXISTS idx_products_version ON products (version);
+        """)
+        self._rekey_by_link()
+        self._conn.commit()
+
+    def _rekey_by_link(self):
+        """Перевод строк прежних версий с ключом по артикулу на ключ по ссылке
+
+        Под одним эвристически найденным артикулом могли оказаться разные
+        товары, поэтому описание таких строк загружается заново.
+        """
+        rows = self._conn.execute(
+            "SELECT key, link FROM products WHERE key LIKE 'article:%' AND link IS NOT NULL AND link != ''"
+        ).fetchall()
+        for key, link in rows:
+            new_key = product_key({'Ссылка': link})
+            if self._conn.execute("SELECT 1 FROM products WHERE key = ?", (new_key,)).fetchone():
+                self._conn.execute("DELETE FROM products WHERE key = ?", (key,))
+            else:
+                self._conn.execute(f"UPDATE products SET key = ?, detailed_at = NULL, version = {NEXT_VERSION} "
+                                   "WHERE key = ?", (new_key, key))
+            self._conn.execute("UPDATE price_history SET key = ? WHERE key = ?", (new_key, key))
+        if rows:
+            print(f"Индекс товаров: ключи по ссылке для {len(rows)} товаров")
+
+    def add_listener(self, callback):
+        """Подписка на изменения: callback(key, product) для каждого сохраненного товара"""
+        self._listeners.append(callback)
+
+    def _notify(self, products):
+        for product in products:
+            key = product_key(product)
+            if key is not None:
+                for callback in self._listeners:
+                    callback(key, product)
+
+    def merge_listing(self, products):
+        """Сохранение карточек товаров из поиска
+
+        Товары с неизменившимися карточками дополняются сохраненной детальной
+        информацией. Возвращает товары, страницы которых нужно загрузить.
+        """
+        now = time.time()
+        stale = []
+        with self._lock:
+            for product in products:
+                key = product_key(product)
+                if key is None:
+                    stale.append(product)
+                    continue
+
+                new_hash = listing_hash(product)
+                row = self._conn.execute(
+                    "SELECT listing_hash, price, availability, description, characteristics, detailed_at "
+                    "FROM products WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row and row[0] == new_hash and row[5] is not None:
+                    product['Описание'] = row[3]
+                    product['Характеристики'] = row[4]
+                else:
+                    stale.append(product)
+
+                if row is None or (row[1], row[2]) != (product.get('Цена'), product.get('Наличие')):
+                    self._conn.execute(
+                        "INSERT INTO price_history (key, seen_at, price, availability) VALUES (?, ?, ?, ?)",
+                        (key, now, product.get('Цена'), product.get('Наличие'))
+                    )
+
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO products (key, name, price, link, brand, availability, article, "
+                        f"listing_hash, first_seen, last_seen, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                        f"{NEXT_VERSION})",
+                        (key,) + tuple(product.get(field) for field in LISTING_FIELDS) + (new_hash, now, now)
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE products SET name = ?, price = ?, link = ?, brand = ?, availability = ?, "
+                        "article = ?, listing_hash = ?, last_seen = ?, "
+                        "detailed_at = CASE WHEN listing_hash = ? THEN detailed_at ELSE NULL END, "
+                        f"version = CASE WHEN listing_hash = ? THEN version ELSE {NEXT_VERSION} END "
+                        "WHERE key = ?",
+                        tuple(product.get(field) for field in LISTING_FIELDS) + (new_hash, now, new_hash, new_hash, key)
+                    )
+            self._conn.commit()
+
+        self._notify(products)
+        print(f"Индекс товаров: изменилось {len(stale)} из {len(products)}")
+        return stale
+
+    def save_details(self, products):
+        """Сохранение детальной информации, полученной со страниц товаров"""
+        now = time.time()
+        with self._lock:
+            for product in products:
+                key = product_key(product)
+                # Неудачные загрузки не сохраняются, чтобы повторить их позже
+                if key is None or product.get('Описание') in (None, DETAIL_FAILED):
+                    continue
+                self._conn.execute(
+                    f"UPDATE products SET description = ?, characteristics = ?, detailed_at = ?, version = {NEXT_VERSION} "
+                    "WHERE key = ?",
+                    (product.get('Описание'), product.get('Характеристики'), now, key)
+                )
+            self._conn.commit()
+
+        self._notify(products)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS.values())} FROM products WHERE key = ?", (key,)
+            ).fetchone()
+        return self._to_product(row) if row else None
+
+    def iter_products(self):
+        """Все товары хранилища"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT key, {', '.join(COLUMNS.values())} FROM products").fetchall()
+        for row in rows:
+            yield row[0], self._to_product(row[1:])
+
+    def changes(self, after=None):
+        """Товары, измененные после версии after (в том числе другими процессами); все товары без after
+
+        Возвращает наибольшую прочитанную версию и список (ключ, товар).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT version, key, {', '.join(COLUMNS.values())} FROM products WHERE version > ? "
+                "ORDER BY version", (-1 if after is None else after,)
+            ).fetchall()
+        version = rows[-1][0] if rows else after
+        return version, [(row[1], self._to_product(row[2:])) for row in rows]
+
+    def history(self, key):
+        """История цены и наличия товара"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seen_at, price, availability FROM price_history WHERE key = ? ORDER BY seen_at",
+                (key,)
+            ).fetchall()
+        return [{'seen_at': seen_at, 'Цена': price, 'Наличие': availability}
+                for seen_at, price, availability in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _to_product(self, row):
+        product = dict(zip(COLUMNS, row))
+        if product['Описание'] is None:
+            del product['Описание']
+            del product['Характеристики']
+        return product
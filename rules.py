@@ -0,0 +1,239 @@
+import json
+import os
+import re
+
+import soupsieve
+from bs4 import Tag
+
+
+class ExtractorRules:
+    """Правила извлечения данных о товарах для одного сайта
+
+    Все регулярные выражения и CSS-селекторы компилируются один раз при
+    создании набора правил; извлекатели парсера используют готовые объекты.
+    """
+
+    def __init__(self, card_classes, card_tags, card_class_words, price_text, name_selectors,
+                 name_skip, price_patterns, link_skip, brand_selectors, in_stock_words,
+                 out_of_stock_words, article_patterns, description_selectors, pagination_selectors,
+                 pagination_patterns, category_patterns):
+        # Исходные описания правил, из которых можно заново собрать набор
+        self.source = {
+            'card_classes': list(card_classes),
+            'card_tags': list(card_tags),
+            'card_class_words': list(card_class_words),
+            'price_text': list(price_text),
+            'name_selectors': list(name_selectors),
+            'name_skip': list(name_skip),
+            'price_patterns': list(price_patterns),
+            'link_skip': list(link_skip),
+            'brand_selectors': list(brand_selectors),
+            'in_stock_words': list(in_stock_words),
+            'out_of_stock_words': list(out_of_stock_words),
+            'article_patterns': list(article_patterns),
+            'description_selectors': list(description_selectors),
+            'pagination_selectors': list(pagination_selectors),
+            'pagination_patterns': list(pagination_patterns),
+            'category_patterns': list(category_patterns),
+        }
+
+        # Поиск карточек товаров
+        self.card_classes = list(card_classes)
+        self.card_class_set = frozenset(card_classes)
+        self.card_tags = frozenset(card_tags)
+        self.card_class_words = _compile_words(card_class_words)
+        self.price_text = re.compile('|'.join(price_text), re.IGNORECASE)
+
+        # Извлекатели полей
+        self.name_selectors = [soupsieve.compile(selector) for selector in name_selectors]
+        self.name_skip = re.compile('|'.join(name_skip), re.IGNORECASE)
+        self.price_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in price_patterns]
+        self.link_skip = tuple(link_skip)
+        self.brand_selectors = [soupsieve.compile(selector) for selector in brand_selectors]
+        self.in_stock_words = _compile_words(in_stock_words)
+        self.out_of_stock_words = _compile_words(out_of_stock_words)
+        self.article_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in article_patterns]
+        self.description_selectors = [soupsieve.compile(selector) for selector in description_selectors]
+
+        # Обход каталога: ссылки пагинации и категорий
+        self.pagination_selector = soupsieve.compile(', '.join(pagination_selectors))
+        self.pagination_url = re.compile('|'.join(pagination_patterns), re.IGNORECASE)
+        self.category_url = re.compile('|'.join(category_patterns), re.IGNORECASE)
+
+    @classmethod
+    def from_dict(cls, data, base=None):
+        """Создание набора правил из словаря; недостающие поля берутся из base"""
+        values = dict(base.source) if base is not None else {}
+        values.update(data)
+        return cls(**values)
+
+    @classmethod
+    def from_json(cls, path, base=None):
+        """Загрузка набора правил из JSON-файла"""
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f), base=base)
+
+    def to_dict(self):
+        return {key: list(value) for key, value in self.source.items()}
+
+
+# Селекторы вида tag, .class и tag.class, которые проверяются без soupsieve
+SIMPLE_SELECTOR = re.compile(r'([a-zA-Z][\w-]*)?(?:\.([\w-]+))?')
+
+
+class SimpleSelector:
+    """Селектор по имени тега и одному классу: прямой обход дерева без разбора CSS
+
+    Поддерживает select и select_one, как скомпилированные селекторы soupsieve,
+    и работает в несколько раз быстрее на больших страницах.
+    """
+
+    __slots__ = ('tag', 'css_class')
+
+    def __init__(self, tag=None, css_class=None):
+        self.tag = tag
+        self.css_class = css_class
+
+    def match(self, node):
+        if self.tag is not None and node.name != self.tag:
+            return False
+        return self.css_class is None or self.css_class in (node.attrs.get('class') or ())
+
+    def select(self, root):
+        return [node for node in root.descendants if isinstance(node, Tag) and self.match(node)]
+
+    def select_one(self, root):
+        for node in root.descendants:
+            if isinstance(node, Tag) and self.match(node):
+                return node
+        return None
+
+
+def compile_selector(selector):
+    """SimpleSelector для простых селекторов, иначе скомпилированный селектор soupsieve"""
+    match = SIMPLE_SELECTOR.fullmatch(selector)
+    if match and any(match.groups()):
+        return SimpleSelector(*match.groups())
+    return soupsieve.compile(selector)
+
+
+class LayoutProfile:
+    """Выученная разметка карточек товаров сайта
+
+    card - CSS-селектор карточки, name и brand - селекторы полей внутри
+    карточки (None - поле ищется всеми правилами по порядку). Профиль
+    сохраняется в состоянии парсера и позволяет находить карточки одним
+    целевым запросом вместо перебора всех правил.
+    """
+
+    def __init__(self, card, name=None, brand=None):
+        self.source = {'card': card, 'name': name, 'brand': brand}
+        self.card = compile_selector(card)
+        self.name = compile_selector(name) if name else None
+        self.brand = compile_selector(brand) if brand else None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Профиль из сохраненного словаря; None, если словарь пуст или поврежден"""
+        if not isinstance(data, dict) or not data.get('card'):
+            return None
+        try:
+            return cls(data['card'], data.get('name'), data.get('brand'))
+        except (soupsieve.SelectorSyntaxError, TypeError):
+            return None
+
+    def to_dict(self):
+        return dict(self.source)
+
+
+def _compile_words(words):
+    """Одно регулярное выражение для поиска любого из слов как подстроки"""
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+
+JAZZ_SHOP_RULES = ExtractorRules(
+    card_classes=[
+        'product',
+        'item',
+        'goods',
+        'catalog-item',
+        'product-item',
+        'item-product',
+        'card',
+        'product-card',
+        'shop-item'
+    ],
+    card_tags=['div', 'article', 'li'],
+    card_class_words=['product', 'item', 'card', 'goods', 'shop'],
+    price_text=[r'руб', r'р\.', r'₽', r'цена'],
+    name_selectors=[
+        '.name',
+        '.title',
+        '.product-name',
+        '.item-name',
+        'h1', 'h2', 'h3', 'h4',
+        'a[class*="name"]',
+        'a[class*="title"]'
+    ],
+    name_skip=[r'^(купить|в корзину|подробнее)$'],
+    price_patterns=[
+        r'(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)\s*руб',
+        r'(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)\s*р\.',
+        r'цена[:\s]*(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)',
+        r'₽\s*(\d{1,3}(?:\s?\d{3})*(?:\,\d{2})?)'
+    ],
+    link_skip=['javascript:', '#', 'mailto:', 'tel:'],
+    brand_selectors=[
+        '.brand',
+        '.vendor',
+        '.producer',
+        '.manufacturer'
+    ],
+    in_stock_words=['в наличии', 'есть', 'доступен', 'available', 'купить'],
+    out_of_stock_words=['нет в наличии', 'распродан', 'ожидается', 'под заказ'],
+    article_patterns=[
+        r'арт[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
+        r'art[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
+        r'код[.\s]*[:#]?\s*([a-zA-Z0-9-]+)',
+        r'code[.\s]*[:#]?\s*([a-zA-Z0-9-]+)'
+    ],
+    description_selectors=[
+        '.description',
+        '.product-description',
+        '.item-description',
+        '[class*="desc"]',
+        '#description'
+    ],
+    pagination_selectors=[
+        'a[rel="next"]',
+        '.pagination a',
+        '.pager a',
+        '.paging a'
+    ],
+    pagination_patterns=[r'[?&]PAGEN_\d+=\d+', r'[?&]page=\d+'],
+    category_patterns=[r'^/catalog/[^/?#]+/$'],
+)
+
+# Реестр наборов правил по имени сайта
+RULE_SETS = {
+    'jazz-shop.ru': JAZZ_SHOP_RULES,
+}
+
+
+def register_rules(name, rules):
+    """Регистрация набора правил под именем сайта"""
+    RULE_SETS[name] = rules
+
+
+def load_rules(name_or_path=None):
+    """Набор правил по имени из реестра или из JSON-файла
+
+    Поля, не указанные в файле, берутся из правил jazz-shop.ru.
+    """
+    if not name_or_path:
+        return JAZZ_SHOP_RULES
+    if name_or_path in RULE_SETS:
+        return RULE_SETS[name_or_path]
+    if os.path.exists(name_or_path):
+        return ExtractorRules.from_json(name_or_path, base=JAZZ_SHOP_RULES)
+    raise ValueError(f"Неизвестный набор правил: {name_or_path}")
@@ -0,0 +1,199 @@
+import heapq
+import json
+import math
+import re
+import threading
+from collections import defaultdict
+
+from product import FIELDS, Product
+
+# Веса полей товара при ранжировании
+FIELD_WEIGHTS = {
+    'Название': 3.0,
+    'Бренд': 2.0,
+    'Описание': 1.0,
+    'Характеристики': 1.0,
+}
+
+TOKEN_RE = re.compile(r'[0-9a-zа-яё]+')
+CYRILLIC_RE = re.compile(r'[а-яё]')
+
+# Стеммер Портера для русского языка
+VOWELS_RV_RE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND_RE = re.compile(r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE_RE = re.compile(r'(с[яь])$')
+ADJECTIVE_RE = re.compile(r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE_RE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB_RE = re.compile(r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|'
+                     r'ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN_RE = re.compile(r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|'
+                     r'ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL_RE = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова; слова на латинице и числа не изменяются"""
+    if not CYRILLIC_RE.search(word):
+        return word
+    match = VOWELS_RV_RE.match(word.replace('ё', 'е'))
+    if match is None:
+        return word
+
+    start, rv = match.groups()
+    temp = PERFECTIVE_GERUND_RE.sub('', rv, 1)
+    if temp == rv:
+        rv = REFLEXIVE_RE.sub('', rv, 1)
+        temp = ADJECTIVE_RE.sub('', rv, 1)
+        if temp != rv:
+            rv = PARTICIPLE_RE.sub('', temp, 1)
+        else:
+            temp = VERB_RE.sub('', rv, 1)
+            rv = NOUN_RE.sub('', rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if DERIVATIONAL_RE.match(rv):
+        rv = DERIVATIONAL_SUFFIX_RE.sub('', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE_RE.sub('', rv, 1)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return start + rv
+
+
+def tokenize(text):
+    """Разбиение текста на основы слов"""
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())]
+
+
+def product_text(product, field):
+    """Текст поля товара; характеристики разворачиваются в пары ключ-значение"""
+    if isinstance(product, Product):
+        value = getattr(product, FIELDS[field][0]) or ''
+    else:
+        value = product.get(field) or ''
+    if field == 'Характеристики' and isinstance(value, str):
+        try:
+            value = json.loads(value or '{}')
+        except ValueError:
+            return value
+    if isinstance(value, dict):
+        return ' '.join(f"{key} {item}" for key, item in value.items())
+    return str(value)
+
+
+class SearchIndex:
+    """Инвертированный индекс товаров в памяти с ранжированием BM25
+
+    Вклад слова в оценку товара (без IDF) вычисляется при добавлении товара,
+    а списки товаров по убыванию вклада кэшируются для каждого слова, поэтому
+    при поиске оцениваются только лучшие кандидаты.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Сколько лучших товаров каждого слова оценивать при большом числе совпадений
+    CANDIDATES = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._ranked = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._products = {}
+        self._total_length = 0.0
+
+    def __len__(self):
+        return len(self._products)
+
+    def add(self, key, product):
+        """Добавление или обновление товара в индексе"""
+        product = Product.from_dict(product)
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product_text(product, field)):
+                weights[term] += weight
+
+        with self._lock:
+            self._remove(key)
+            length = sum(weights.values())
+            avg_length = (self._total_length + length) / (len(self._products) + 1) or 1.0
+            norm = self.K1 * (1 - self.B + self.B * length / avg_length)
+            for term, tf in weights.items():
+                self._postings[term][key] = tf * (self.K1 + 1) / (tf + norm)
+                self._ranked.pop(term, None)
+            self._doc_terms[key] = list(weights)
+            self._doc_lengths[key] = length
+            self._total_length += length
+            self._products[key] = product
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def search(self, query, limit=50):
+        """Товары, ранжированные по релевантности запросу
+
+        Товары, содержащие все слова запроса, идут выше частичных совпадений.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            count = len(self._products)
+            terms = sorted((t for t in terms if t in self._postings), key=lambda t: len(self._postings[t]))
+            if not terms:
+                return []
+            if len(terms) == 1:
+                return [self._products[key].to_dict() for key in self._top(terms[0], limit)]
+
+            postings = [self._postings[t] for t in terms]
+            idfs = [math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+            def score(key):
+                return sum(idf * p.get(key, 0.0) for idf, p in zip(idfs, postings))
+
+            # Полные совпадения: пересечение списков, начиная с самого короткого
+            full = set(postings[0])
+            for p in postings[1:]:
+                full.intersection_update(p.keys())
+            if len(full) > self.CANDIDATES:
+                pool = full & set().union(*(self._top(t, self.CANDIDATES) for t in terms))
+                if len(pool) >= limit:
+                    full = pool
+            ranked = heapq.nlargest(limit, full, key=score)
+
+            # Частичные совпадения - среди лучших товаров каждого слова
+            if len(ranked) < limit:
+                partial = set().union(*(self._top(t, limit) for t in terms)) - full
+                ranked += heapq.nlargest(limit - len(ranked), partial,
+                                         key=lambda key: (sum(key in p for p in postings), score(key)))
+
+            return [self._products[key].to_dict() for key in ranked]
+
+    def _top(self, term, n):
+        """Первые n товаров слова по убыванию вклада в оценку"""
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            postings = self._postings[term]
+            ranked = self._ranked[term] = sorted(postings, key=postings.__getitem__, reverse=True)
+        return ranked[:n]
+
+    def _remove(self, key):
+        for term in self._doc_terms.pop(key, ()):
+            self._ranked.pop(term, None)
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(key, 0.0)
+        self._products.pop(key, None)
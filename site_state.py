@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+
+
+class SiteState:
+    """Сохраняемое между запусками состояние парсера (JSON-файл)"""
+
+    def __init__(self, path='jazz_shop_state.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        """Загрузка состояния из файла"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key, default=None):
+        """Получение сохраненного значения"""
+        with self._lock:
+            return self._data.get(key, default)
+
+    def set(self, key, value):
+        """Сохранение значения с записью на диск
+
+        Файл перед записью перечитывается, и в него добавляется только это
+        значение: ключи, сохраненные другими процессами (воркерами gunicorn,
+        пакетным поиском), не затираются.
+        """
+        with self._lock:
+            if self._data.get(key) == value:
+                return
+            self._data = self._load()
+            self._data[key] = value
+            self._save()
+
+    def _save(self):
+        """Атомарная запись состояния на диск"""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Ошибка сохранения состояния {self.path}: {e}")